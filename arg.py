@@ -2,13 +2,12 @@ from constants import *
 
 
 class Arg:
-    def __init__(self, element, trace_output=False):
-        self.trace_output = trace_output
+    __slots__ = ("name", "ref")
+
+    def __init__(self, element):
         self.__load_element(element)
 
     def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
         if type(element) != Element:
             raise Exception(f"Expected Element, got {type(element)}")
         if element.elem_type == InterpreterBase.ARG_DEF:
@@ -24,5 +23,5 @@ class Arg:
     def is_ref(self):
         return self.ref
 
-    def evaluate(self):
+    def evaluate(self, scope=None):
         return self
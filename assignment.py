@@ -5,35 +5,37 @@ from intbase import ErrorType
 
 
 class Assignment:
-    def __init__(self, scope, element, trace_output=False):
-        self.scope = scope
-        self.trace_output = trace_output
-        self.__load_element(element)
+    __slots__ = ("name", "value", "address")
 
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element or element.elem_type != ASSIGNMENT:
             raise Exception(f"Expected Element, got {type(element)}")
         self.name = element.get(NAME)
-        self.value = convert_element.convert_element(
-            element.get(EXPRESSION), self.scope
-        )
+        self.value = convert_element.convert_element(element.get(EXPRESSION), addresses)
+        # Found by resolve_function if this assigns to one of the function's
+        # arguments
+        self.address = None if addresses is None else addresses.get(element)
 
-    def evaluate(self):
-        if self.trace_output:
+    def evaluate(self, scope):
+        if scope.interpreter.trace_output:
             print(f"Evaluating {str(self)}")
-        self.value = self.value.evaluate()
+        value = self.value.evaluate(scope)
         if "." in self.name:
             name, field = self.name.split(".")
-            var = self.scope.get_var(name)
+            if self.address is not None:
+                var = scope.get_slot_ref(*self.address).get_val()
+            else:
+                var = scope.get_var(name)
             if var.get_type() != InterpreterBase.OBJ_DEF:
-                self.scope.error(
-                    ErrorType.TYPE_ERROR, f"Cannot assign field to non-object"
-                )
-            self.scope.get_var(name).set_field(field, self.value)
-            return
-        self.scope.set_var(self.name, self.value)
+                scope.error(ErrorType.TYPE_ERROR, f"Cannot assign field to non-object")
+            var.set_field(field, value, scope.owner)
+        elif self.address is not None:
+            scope.set_slot_var(*self.address, value)
+        else:
+            scope.set_var(self.name, value)
 
     def __str__(self):
         return f"Assignment({self.name}, {str(self.value)})"
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from brewpratt import parse_program
+from element import Element
+
+# Part of every cache key - bump this whenever the grammar or the Element
+# trees it produces change, so entries from older parsers are never loaded
+GRAMMAR_VERSION = 2
+
+
+class ASTCache:
+    """Content-addressed on-disk cache of parsed programs.
+
+    Each program's Element tree is pickled into cache_dir under the hash of
+    its source and GRAMMAR_VERSION, so running the same program again loads
+    the tree instead of parsing it. The cache is best effort: unreadable
+    entries are reparsed and failed writes are ignored.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def parse(self, program):
+        path = self.get_path(program)
+        ast = self.__load(path)
+        if ast is None:
+            ast = parse_program(program)
+            # Stored before anything can modify the tree
+            self.__store(path, ast)
+        return ast
+
+    def get_path(self, program):
+        key = hashlib.sha256(f"{GRAMMAR_VERSION}\0{program}".encode("utf-8"))
+        return os.path.join(self.cache_dir, key.hexdigest() + ".ast")
+
+    # A stale or foreign entry can fail to load in any number of ways, none
+    # of which may fail the program - it's removed and the program reparsed
+    def __load(self, path):
+        try:
+            with open(path, "rb") as handle:
+                ast = pickle.load(handle)
+            if type(ast) != Element:
+                raise TypeError(f"Expected Element, got {type(ast)}")
+            return ast
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.__remove(path)
+            return None
+
+    def __remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    # Written to a temporary file first, so concurrent runs never see a
+    # partially written entry
+    def __store(self, path, ast):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    pickle.dump(ast, handle, pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except (OSError, pickle.PicklingError, RecursionError):
+            pass
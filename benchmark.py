@@ -0,0 +1,632 @@
+"""
+Benchmarks for the Brewin interpreter.
+
+Usage: python benchmark.py [benchmark ...]
+Runs every benchmark when none are named.
+"""
+
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import binary_operator
+import brewparse
+import brewpratt
+import interpreterv4
+from element import Element
+from intbase import InterpreterBase
+from object_def import ObjectDef
+from scope import Scope
+from value import Value
+from value_wrapper import ValueWrapper
+
+
+def best_time(func, repeat=5):
+    """Fastest of repeat runs of func, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def generate_expression(rng, depth):
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(["x", "y", "o.f", str(rng.randint(0, 999)), '"str"', "true"])
+    kind = rng.random()
+    if kind < 0.6:
+        op = rng.choice(["+", "-", "*", "/", "==", "<", ">=", "!=", "&&", "||"])
+        left = generate_expression(rng, depth - 1)
+        right = generate_expression(rng, depth - 1)
+        return f"{left} {op} {right}"
+    if kind < 0.7:
+        return f"-({generate_expression(rng, depth - 1)})"
+    if kind < 0.8:
+        return f"!{generate_expression(rng, depth - 1)}"
+    if kind < 0.9:
+        return f"f{rng.randint(0, 9)}(x, {generate_expression(rng, depth - 1)})"
+    return f"o.m({generate_expression(rng, depth - 1)})"
+
+
+def generate_statements(rng, count, depth):
+    lines = []
+    for _ in range(count):
+        kind = rng.random()
+        if depth > 0 and kind < 0.1:
+            lines.append(f"if ({generate_expression(rng, 2)}) {{")
+            lines.extend(generate_statements(rng, 3, depth - 1))
+            lines.append("} else {")
+            lines.extend(generate_statements(rng, 2, depth - 1))
+            lines.append("}")
+        elif depth > 0 and kind < 0.2:
+            lines.append(f"while ({generate_expression(rng, 2)}) {{")
+            lines.extend(generate_statements(rng, 3, depth - 1))
+            lines.append("}")
+        elif kind < 0.25:
+            lines.append("/* a comment */")
+            lines.append(f"g = lambda(a, ref b) {{ return a + b; }};")
+        elif kind < 0.85:
+            lines.append(f"x = {generate_expression(rng, 4)};")
+        else:
+            lines.append(f"print({generate_expression(rng, 3)});")
+    return lines
+
+
+def generate_program(num_funcs, statements_per_func, seed=131):
+    """A large syntactically valid program, the same one for a given seed"""
+    rng = random.Random(seed)
+    lines = []
+    for index in range(num_funcs):
+        lines.append(f"func f{index}(x, ref y) {{")
+        lines.extend(generate_statements(rng, statements_per_func, 2))
+        lines.append("return x;")
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def bench_parse():
+    """Parse throughput of both parsers on a large generated program, and on
+    many small ones"""
+    large = generate_program(200, 50)
+    small = [generate_program(3, 10, seed) for seed in range(200)]
+    for name, parse_program in (
+        ("ply", brewparse.parse_program),
+        ("pratt", brewpratt.parse_program),
+    ):
+        seconds = best_time(lambda: parse_program(large))
+        rate = len(large) / seconds / 1000
+        print(f"parse large {name:8} {seconds * 1000:9.2f} ms {rate:9.1f} KB/s")
+        seconds = best_time(lambda: [parse_program(program) for program in small])
+        rate = sum(len(program) for program in small) / seconds / 1000
+        print(f"parse small {name:8} {seconds * 1000:9.2f} ms {rate:9.1f} KB/s")
+
+
+def run_program(program, repeat=3, **options):
+    """Best time to run program on a new interpreter, and its output"""
+    interpreters = []
+
+    def run():
+        interpreter = interpreterv4.Interpreter(False, **options)
+        interpreter.run(program)
+        interpreters.append(interpreter)
+
+    seconds = best_time(run, repeat)
+    return seconds, interpreters[-1].get_output()
+
+
+def bench_program(name, program, repeat=3):
+    """Times program on both the tree-walker and the bytecode VM"""
+    for engine, options in (("tree", {}), ("vm", {"use_bytecode": True})):
+        seconds, output = run_program(program, repeat, **options)
+        print(f"{name} {engine:5} {seconds * 1000:9.2f} ms  output {output[-1]}")
+
+
+CALLS_PROGRAM = """
+func fib(n) {
+  if (n < 2) {
+    return n;
+  }
+  return fib(n - 1) + fib(n - 2);
+}
+
+func pass(a, b, c) {
+  return a;
+}
+
+func main() {
+  print(fib(18));
+  i = 0;
+  s = "string";
+  while (i < 5000) {
+    i = pass(i, s, true) + 1;
+  }
+  print(i);
+}
+"""
+
+
+def bench_calls():
+    """Function calls passing and returning primitives"""
+    bench_program("calls", CALLS_PROGRAM)
+
+
+def generate_returns_program(num_fields, depth):
+    """An object with num_fields fields passed back up depth calls"""
+    fields = "\n".join(f"  o.f{index} = {index};" for index in range(num_fields))
+    return f"""
+func make() {{
+  o = @;
+{fields}
+  return o;
+}}
+
+func relay(n) {{
+  if (n == 0) {{
+    return make();
+  }}
+  o = relay(n - 1);
+  return o;
+}}
+
+func main() {{
+  o = relay({depth});
+  print(o.f{num_fields - 1});
+}}
+"""
+
+
+def bench_returns():
+    """Returning an object with 10k fields through a chain of calls"""
+    bench_program("returns", generate_returns_program(10000, 20))
+
+
+CLOSURES_PROGRAM = """
+func descend(n) {
+  a = n;
+  b = "string";
+  c = true;
+  d = @;
+  if (n > 0) {
+    return descend(n - 1);
+  }
+  total = 0;
+  i = 0;
+  while (i < 1000) {
+    add = lambda(x) { return x + i; };
+    total = add(total);
+    i = i + 1;
+  }
+  return total;
+}
+
+func main() {
+  print(descend(40));
+}
+"""
+
+
+def bench_closures():
+    """Making lambdas in a loop below a deep stack of frames"""
+    bench_program("closures", CLOSURES_PROGRAM)
+
+
+LAMBDA_CALLS_PROGRAM = """
+func descend(n, f) {
+  a = n;
+  b = "string";
+  if (n > 0) {
+    return descend(n - 1, f);
+  }
+  total = 0;
+  i = 0;
+  while (i < 1000) {
+    total = f(total);
+    i = i + 1;
+  }
+  return total;
+}
+
+func main() {
+  step = 3;
+  add = lambda(x) { return x + step; };
+  print(descend(40, add));
+  sum = lambda(n) {
+    if (n == 0) {
+      return 0;
+    }
+    return n + sum(n - 1);
+  };
+  print(sum(60));
+}
+"""
+
+
+def bench_lambda_calls():
+    """Calling a lambda below a deep stack of frames, and a recursive lambda"""
+    bench_program("lambda calls", LAMBDA_CALLS_PROGRAM)
+
+
+OBJECTS_PROGRAM = """
+func point(x, y) {
+  p = @;
+  p.x = x;
+  p.y = y;
+  p.z = x + y;
+  p.label = "point";
+  p.visible = true;
+  return p;
+}
+
+func main() {
+  head = nil;
+  i = 0;
+  while (i < 3000) {
+    node = point(i, i * 2);
+    node.next = head;
+    head = node;
+    i = i + 1;
+  }
+  total = 0;
+  while (head != nil) {
+    total = total + head.x + head.y + head.z;
+    head = head.next;
+  }
+  print(total);
+}
+"""
+
+
+def bench_objects():
+    """Building a linked list of thousands of similar objects, then walking it"""
+    bench_program("objects", OBJECTS_PROGRAM)
+
+
+METHODS_PROGRAM = """
+func add(x, y) {
+  return x + y;
+}
+
+func main() {
+  o = @;
+  o.total = 0;
+  o.add = lambda(x) { this.total = this.total + x; };
+  i = 0;
+  while (i < 3000) {
+    o.add(i);
+    i = i + 1;
+  }
+  print(o.total);
+  total = 0;
+  i = 0;
+  while (i < 3000) {
+    total = add(total, i);
+    i = i + 1;
+  }
+  print(total);
+}
+"""
+
+
+def bench_methods():
+    """Method calls updating their object, then the same sum by plain calls"""
+    bench_program("methods", METHODS_PROGRAM)
+
+
+# Each operator with the operands it's applied to
+OPERATOR_CASES = [
+    ("+", "i", "3"),
+    ("-", "i", "3"),
+    ("*", "i", "3"),
+    ("/", "i", "3"),
+    ("==", "i", "3"),
+    ("!=", "i", "3"),
+    ("<", "i", "3"),
+    ("<=", "i", "3"),
+    (">", "i", "3"),
+    (">=", "i", "3"),
+    ("&&", "t", "f"),
+    ("||", "t", "f"),
+    ("+", '"s"', '"t"'),
+    ("==", '"s"', '"t"'),
+    ("+", "t", "i"),
+]
+
+
+def generate_operator_program(op, left, right, iterations=2000):
+    """A loop applying op to left and right, alongside the loop's own i < n
+    and i + 1"""
+    return f"""
+func main() {{
+  t = true;
+  f = false;
+  x = nil;
+  i = 0;
+  while (i < {iterations}) {{
+    x = {left} {op} {right};
+    x = {left} {op} {right};
+    x = {left} {op} {right};
+    x = {left} {op} {right};
+    i = i + 1;
+  }}
+  print(x);
+}}
+"""
+
+
+def bench_operators():
+    """Each binary operator in a loop, and a few operand types needing
+    conversion"""
+    for op, left, right in OPERATOR_CASES:
+        program = generate_operator_program(op, left, right)
+        bench_program(f"operator {left:3} {op:2} {right:3}", program)
+
+
+ARITHMETIC_PROGRAM = """
+func fib(n) {
+  if (n < 2) {
+    return n;
+  }
+  return fib(n - 1) + fib(n - 2);
+}
+
+func main() {
+  total = 0;
+  i = 0;
+  while (i < 5000) {
+    total = total + i * i - i / 3;
+    i = i + 1;
+  }
+  print(total);
+  print(fib(16));
+}
+"""
+
+
+def bench_arithmetic():
+    """An accumulating loop and recursive Fibonacci, and how much of their
+    arithmetic the tree-walker ran specialized for ints"""
+    bench_program("arithmetic", ARITHMETIC_PROGRAM)
+    interpreter = interpreterv4.Interpreter(False)
+    stats = interpreter.quickening_stats = binary_operator.QuickeningStats()
+    interpreter.run(ARITHMETIC_PROGRAM)
+    print(f"arithmetic quickening: {stats}, {stats.fast_rate() * 100:.1f}% fast")
+
+
+TAIL_CALLS_PROGRAM = """
+func count(n, total) {
+  if (n == 0) {
+    return total;
+  }
+  return count(n - 1, total + n);
+}
+
+func main() {
+  print(count(20000, 0));
+}
+"""
+
+
+def bench_tail_calls():
+    """Accumulator recursion far deeper than Python's recursion limit"""
+    bench_program("tail calls", TAIL_CALLS_PROGRAM)
+
+
+def generate_deep_calls_program(depth):
+    """Summing 1 to depth by recursion that isn't a tail call"""
+    return f"""
+func sum(n) {{
+  if (n == 0) {{
+    return 0;
+  }}
+  return n + sum(n - 1);
+}}
+
+func main() {{
+  print(sum({depth}));
+}}
+"""
+
+
+def generate_deep_lambda_calls_program(depth):
+    """The same sum by a recursive lambda, which also reads a captured
+    variable at every depth"""
+    return f"""
+func main() {{
+  zero = 0;
+  sum = lambda(n) {{
+    if (n == zero) {{
+      return 0;
+    }}
+    return n + sum(n - 1);
+  }};
+  print(sum({depth}));
+}}
+"""
+
+
+def bench_deep_calls():
+    """Recursion that isn't a tail call, far deeper than Python's recursion
+    limit, by a function and by a lambda. Only the bytecode VM runs it, the
+    tree-walker recurses in Python"""
+    for kind, generate in (
+        ("calls", generate_deep_calls_program),
+        ("lambdas", generate_deep_lambda_calls_program),
+    ):
+        for depth in (1000, 10000, 100000):
+            program = generate(depth)
+            seconds, output = run_program(program, use_bytecode=True)
+            print(
+                f"deep {kind:7} {depth:6} {seconds * 1000:9.2f} ms  "
+                f"output {output[-1]}"
+            )
+
+
+PROTOS_PROGRAM = """
+func main() {
+  base = @;
+  base.step = 2;
+  base.add = lambda(x) { return x + this.step; };
+  proto = base;
+  i = 0;
+  while (i < 20) {
+    next = @;
+    next.proto = proto;
+    proto = next;
+    i = i + 1;
+  }
+  o = @;
+  o.proto = proto;
+  total = 0;
+  i = 0;
+  while (i < 3000) {
+    total = o.add(total) + o.step;
+    i = i + 1;
+  }
+  print(total);
+}
+"""
+
+
+def bench_protos():
+    """Method calls and field reads found at the end of a long prototype chain"""
+    bench_program("protos", PROTOS_PROGRAM)
+
+
+def allocated_per_object(make, count=10000):
+    """Bytes tracemalloc sees allocated for each of count objects make makes,
+    counting the list slot holding it"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make() for _ in range(count)]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return allocated / count
+
+
+def read_test(path):
+    """The program in a test file, and the lines of its *IN* block"""
+    with open(path, encoding="utf-8") as handle:
+        lines = handle.readlines()
+    inputs = []
+    in_block = False
+    for line in lines:
+        if line.strip() == "*IN*":
+            in_block = not in_block
+        elif in_block:
+            inputs.append(line.rstrip("\n"))
+    return "".join(lines), inputs
+
+
+def bench_memory():
+    """Memory of each kind of runtime object, and peak memory running every
+    v4 test program"""
+    interpreter = interpreterv4.Interpreter(False)
+    base_scope = Scope(None, interpreter)
+    object_element = Element(InterpreterBase.OBJ_DEF)
+    kinds = {
+        "Value": lambda: Value(True),
+        "ValueWrapper": lambda: ValueWrapper(None),
+        "Scope": lambda: Scope(base_scope),
+        "ObjectDef": lambda: ObjectDef(object_element, interpreter, None),
+        "Element": lambda: Element(InterpreterBase.VAR_DEF, name="x"),
+    }
+    for name, make in kinds.items():
+        print(f"memory {name:12} {allocated_per_object(make):7.1f} bytes/object")
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "v4", "tests")
+    peaks = []
+    for file_name in sorted(os.listdir(directory)):
+        program, inputs = read_test(os.path.join(directory, file_name))
+        tracemalloc.start()
+        interpreterv4.Interpreter(False, inputs).run(program)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(
+        f"memory v4/tests      {len(peaks)} programs, peak total {sum(peaks) / 1024:.1f} KB,"
+        f" largest {max(peaks) / 1024:.1f} KB"
+    )
+
+
+# Run in a fresh process, prints the import and first run times in seconds
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{run}
+print(imported - start, time.perf_counter() - imported)
+"""
+
+STARTUP_PROGRAM = "func main() { x = 5; print(x * 2); }"
+
+STARTUP_CASES = {
+    "interpreterv4": f"interpreterv4.Interpreter(False).run({STARTUP_PROGRAM!r})",
+    "brewparse": f"brewparse.parse_program({STARTUP_PROGRAM!r})",
+}
+
+
+def bench_startup(runs=10):
+    """Cold start of a new process: importing a module, then its first run"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module, run in STARTUP_CASES.items():
+        import_times = []
+        run_times = []
+        wall_times = []
+        for _ in range(runs):
+            script = STARTUP_SCRIPT.format(module=module, run=run)
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-c", script],
+                cwd=directory,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            wall_times.append(time.perf_counter() - start)
+            import_time, run_time = result.stdout.split()[-2:]
+            import_times.append(float(import_time))
+            run_times.append(float(run_time))
+        print(
+            f"startup {module:14} import {statistics.median(import_times) * 1000:7.2f} ms"
+            f"  first run {statistics.median(run_times) * 1000:7.2f} ms"
+            f"  process {statistics.median(wall_times) * 1000:7.2f} ms"
+        )
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "calls": bench_calls,
+    "returns": bench_returns,
+    "closures": bench_closures,
+    "lambda_calls": bench_lambda_calls,
+    "objects": bench_objects,
+    "methods": bench_methods,
+    "tail_calls": bench_tail_calls,
+    "deep_calls": bench_deep_calls,
+    "protos": bench_protos,
+    "operators": bench_operators,
+    "arithmetic": bench_arithmetic,
+    "memory": bench_memory,
+    "startup": bench_startup,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name}, expected one of {list(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,216 +1,406 @@
+import operator
 from element import Element
-from value import Value
+from value import Value, make_value
 from constants import *
 import convert_element
 from intbase import InterpreterBase
 from intbase import ErrorType
 
+# Evaluations in a row with int operands after which a node switches to its
+# int only evaluation, and how many times it can switch back before it stays
+# generic
+QUICKEN_AFTER = 8
+MAX_DEOPTIMIZATIONS = 4
+
+
+class QuickeningStats:
+    """Counts of what binary operators did, to see how often the int only
+    evaluation is taken. Only kept while an interpreter has one set as its
+    quickening_stats."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Nodes switching to and back from their int only evaluation
+        self.quickened = 0
+        self.deoptimized = 0
+        # Evaluations done by the int only evaluation, and all others
+        self.fast = 0
+        self.generic = 0
+
+    # The share of evaluations done by the int only evaluation
+    def fast_rate(self):
+        total = self.fast + self.generic
+        return self.fast / total if total else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.quickened} quickened, {self.deoptimized} deoptimized, "
+            f"{self.fast} fast and {self.generic} generic evaluations"
+        )
+
 
 class BinaryOperator:
-    def __init__(self, scope, element, trace_output=False):
-        self.scope = scope
-        self.trace_output = trace_output
-        self.__load_element(element)
-
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    __slots__ = (
+        "type",
+        "handlers",
+        "int_operation",
+        "int_result_type",
+        "int_streak",
+        "deoptimizations",
+        "quickened",
+        "left",
+        "right",
+    )
+
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element:
             raise Exception(f"Expected Element, got {type(element)}")
         self.type = element.elem_type
         if not self.type in BINARY_OPERATORS:
             raise Exception(f"Unknown element type {self.type}")
-        self.left = convert_element.convert_element(element.get(OPERAND_1), self.scope)
-        self.right = convert_element.convert_element(element.get(OPERAND_2), self.scope)
-
-    def evaluate(self):
-        if self.trace_output:
-            print(f"Evaluating {str(self)}")
-        self.left = self.left.evaluate()
-        self.right = self.right.evaluate()
-        if self.trace_output:
-            print(f"Left: {str(self.left)}")
-            print(f"Right: {str(self.right)}")
-
-        if self.type in BINARY_ARITH:
-            return self.__eval_arith()
-
-        elif self.type in BINARY_BOOL:
-            return self.__eval_bool()
-
-        elif self.type in BINARY_COMP:
-            return self.__eval_comp()
-
-    def __eval_comp(self):
-        if self.type == EQUALS:
-            return self.__eval_equal()
-        elif self.type == NOT_EQUALS:
-            return self.__eval_not_equal()
-        elif self.type == GREATER_THAN:
-            return self.__eval_greater()
-        elif self.type == GREATER_THAN_EQUALS:
-            return self.__eval_greater_equal()
-        elif self.type == LESS_THAN:
-            return self.__eval_less()
-        elif self.type == LESS_THAN_EQUALS:
-            return self.__eval_less_equal()
-        raise Exception(f"Unknown comparison operator {self.type}")
-
-    def __eval_equal(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type:
+        # The handlers of the operator, by operand types
+        self.handlers = HANDLERS[self.type]
+        # The function applied to the values of two int operands and the type
+        # of its result, if the node can specialize to them
+        self.int_operation, self.int_result_type = INT_OPERATIONS.get(
+            self.type, (None, None)
+        )
+        self.int_streak = 0
+        self.deoptimizations = 0
+        # Whether the node expects int operands and tries int_operation first
+        self.quickened = False
+        self.left = convert_element.convert_element(element.get(OPERAND_1), addresses)
+        self.right = convert_element.convert_element(element.get(OPERAND_2), addresses)
+
+    def evaluate(self, scope):
+        if not self.quickened and scope.interpreter.trace_output:
+            return self.__evaluate_traced(scope)
+        left = self.left.evaluate(scope)
+        right = self.right.evaluate(scope)
+        if self.quickened:
             if (
-                left_type == InterpreterBase.FUNC_DEF
-                or left_type == InterpreterBase.LAMBDA_DEF
-                or left_type == InterpreterBase.OBJ_DEF
+                type(left) is Value
+                and type(right) is Value
+                and type(left.value) is int
+                and type(right.value) is int
             ):
-                return Value(self.left is self.right)
-            return Value(self.left.get_val() == self.right.get_val())
-        # If we have a bool and an int we compare their bool values
-        if (
-            left_type == InterpreterBase.BOOL_DEF
-            and right_type == InterpreterBase.INT_DEF
-        ):
-            return Value(self.left.get_val() == bool(self.right.get_val()))
-        if (
-            left_type == InterpreterBase.INT_DEF
-            and right_type == InterpreterBase.BOOL_DEF
-        ):
-            return Value(bool(self.left.get_val()) == self.right.get_val())
-        # If the types are different, they aren't equal
-        return Value(False)
-
-    def __eval_not_equal(self):
-        return Value(not self.__eval_equal().get_val())
-
-    def __eval_greater(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type and left_type == InterpreterBase.INT_DEF:
-            return Value(self.left.get_val() > self.right.get_val())
-        self.scope.error(
-            ErrorType.TYPE_ERROR,
-            f"Cannot compare {self.left.get_type()} and {self.right.get_type()}",
-        )
+                stats = scope.interpreter.quickening_stats
+                if stats is not None:
+                    stats.fast += 1
+                return Value.of_type(
+                    self.int_operation(left.value, right.value), self.int_result_type
+                )
+            self.__deoptimize(scope)
+        return self.__operate(scope, left, right)
 
-    def __eval_less(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type and left_type == InterpreterBase.INT_DEF:
-            return Value(self.left.get_val() < self.right.get_val())
-        self.scope.error(
-            ErrorType.TYPE_ERROR,
-            f"Cannot compare {self.left.get_type()} and {self.right.get_type()}",
-        )
+    # Traced runs print every evaluation, so their nodes are never quickened
+    def __evaluate_traced(self, scope):
+        print(f"Evaluating {str(self)}")
+        left = self.left.evaluate(scope)
+        right = self.right.evaluate(scope)
+        print(f"Left: {str(left)}")
+        print(f"Right: {str(right)}")
+        return operate(self.type, scope, left, right)
 
-    def __eval_greater_equal(self):
-        return Value(not self.__eval_less().get_val())
-
-    def __eval_less_equal(self):
-        return Value(not self.__eval_greater().get_val())
-
-    def __eval_bool(self):
-        if self.left.get_type() == InterpreterBase.INT_DEF:
-            self.left = self.left.converted_type(InterpreterBase.BOOL_DEF)
-        elif self.left.get_type() != InterpreterBase.BOOL_DEF:
-            self.scope.error(
-                ErrorType.TYPE_ERROR,
-                "Cannot perform boolean operations on non-boolean values",
-            )
-        if self.right.get_type() == InterpreterBase.INT_DEF:
-            self.right = self.right.converted_type(InterpreterBase.BOOL_DEF)
-        elif self.right.get_type() != InterpreterBase.BOOL_DEF:
-            self.scope.error(
-                ErrorType.TYPE_ERROR,
-                "Cannot perform boolean operations on non-boolean values",
-            )
-        if self.type == AND:
-            return self.__eval_and()
-        elif self.type == OR:
-            return self.__eval_or()
-
-    def __eval_and(self):
-        return Value(self.left.get_val() and self.right.get_val())
-
-    def __eval_or(self):
-        return Value(self.left.get_val() or self.right.get_val())
-
-    def __eval_arith(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if (
-            left_type == InterpreterBase.NIL_DEF
-            or right_type == InterpreterBase.NIL_DEF
-        ):
-            self.scope.error(ErrorType.TYPE_ERROR, "Cannot perform arithmetic on nil")
-        # Converting bools to ints
-        if left_type == InterpreterBase.BOOL_DEF:
-            self.left = self.left.converted_type(InterpreterBase.INT_DEF)
-            left_type = InterpreterBase.INT_DEF
-        if right_type == InterpreterBase.BOOL_DEF:
-            self.right = self.right.converted_type(InterpreterBase.INT_DEF)
-            right_type = InterpreterBase.INT_DEF
-
-        if self.type == ADD:
-            return self.__eval_add()
-        elif self.type == SUBTRACT:
-            return self.__eval_sub()
-        elif self.type == MULTIPLY:
-            return self.__eval_mul()
-        elif self.type == DIVIDE:
-            return self.__eval_div()
-        raise Exception(f"Unknown arithmetic operator {self.type}")
-
-    def __eval_add(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        # We add either 2 ints or 2 strings
-        if (
-            left_type == right_type
-            and (
+    def __operate(self, scope, left, right):
+        stats = scope.interpreter.quickening_stats
+        if stats is not None:
+            stats.generic += 1
+        left_type = left.get_type()
+        right_type = right.get_type()
+        if self.int_operation is not None:
+            if (
                 left_type == InterpreterBase.INT_DEF
-                or left_type == InterpreterBase.STRING_DEF
-            )
-        ) or (
-            self.left.get_type() == InterpreterBase.STRING_DEF
-            and self.right.get_type() == InterpreterBase.STRING_DEF
+                and right_type == InterpreterBase.INT_DEF
+            ):
+                self.int_streak += 1
+                if self.int_streak >= QUICKEN_AFTER:
+                    self.__quicken(stats)
+            else:
+                self.int_streak = 0
+        handler = self.handlers.get((left_type, right_type))
+        if handler is not None:
+            return handler(left, right)
+        return _eval_general(self.type, scope, left, right)
+
+    # Makes evaluate try int_operation first, until other operands show up
+    def __quicken(self, stats):
+        if stats is not None:
+            stats.quickened += 1
+        self.quickened = True
+
+    def __deoptimize(self, scope):
+        stats = scope.interpreter.quickening_stats
+        if stats is not None:
+            stats.deoptimized += 1
+        self.quickened = False
+        self.int_streak = 0
+        self.deoptimizations += 1
+        if self.deoptimizations >= MAX_DEOPTIMIZATIONS:
+            self.int_operation = None
+
+    def __str__(self):
+        return f"BinaryOperator({self.type}, {str(self.left)}, {str(self.right)})"
+
+
+# Applies a binary operator to two already evaluated operands
+def operate(op, scope, left, right):
+    handler = HANDLERS[op].get((left.get_type(), right.get_type()))
+    if handler is not None:
+        return handler(left, right)
+    return _eval_general(op, scope, left, right)
+
+
+# Any operator on any operands, converting them and reporting type errors
+def _eval_general(op, scope, left, right):
+    if op in BINARY_ARITH:
+        return _eval_arith(op, scope, left, right)
+
+    elif op in BINARY_BOOL:
+        return _eval_bool(op, scope, left, right)
+
+    elif op in BINARY_COMP:
+        return _eval_comp(op, scope, left, right)
+
+
+def _eval_comp(op, scope, left, right):
+    if op == EQUALS:
+        return _eval_equal(left, right)
+    elif op == NOT_EQUALS:
+        return _eval_not_equal(left, right)
+    elif op == GREATER_THAN:
+        return _eval_greater(scope, left, right)
+    elif op == GREATER_THAN_EQUALS:
+        return _eval_greater_equal(scope, left, right)
+    elif op == LESS_THAN:
+        return _eval_less(scope, left, right)
+    elif op == LESS_THAN_EQUALS:
+        return _eval_less_equal(scope, left, right)
+    raise Exception(f"Unknown comparison operator {op}")
+
+
+def _eval_equal(left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type:
+        if (
+            left_type == InterpreterBase.FUNC_DEF
+            or left_type == InterpreterBase.LAMBDA_DEF
+            or left_type == InterpreterBase.OBJ_DEF
         ):
-            return Value(self.left.get_val() + self.right.get_val())
-        self.scope.error(
+            return make_value(left is right)
+        return make_value(left.get_val() == right.get_val())
+    # If we have a bool and an int we compare their bool values
+    if left_type == InterpreterBase.BOOL_DEF and right_type == InterpreterBase.INT_DEF:
+        return make_value(left.get_val() == bool(right.get_val()))
+    if left_type == InterpreterBase.INT_DEF and right_type == InterpreterBase.BOOL_DEF:
+        return make_value(bool(left.get_val()) == right.get_val())
+    # If the types are different, they aren't equal
+    return make_value(False)
+
+
+def _eval_not_equal(left, right):
+    return make_value(not _eval_equal(left, right).get_val())
+
+
+def _eval_greater(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type and left_type == InterpreterBase.INT_DEF:
+        return make_value(left.get_val() > right.get_val())
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot compare {left.get_type()} and {right.get_type()}",
+    )
+
+
+def _eval_less(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type and left_type == InterpreterBase.INT_DEF:
+        return make_value(left.get_val() < right.get_val())
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot compare {left.get_type()} and {right.get_type()}",
+    )
+
+
+def _eval_greater_equal(scope, left, right):
+    return make_value(not _eval_less(scope, left, right).get_val())
+
+
+def _eval_less_equal(scope, left, right):
+    return make_value(not _eval_greater(scope, left, right).get_val())
+
+
+def _eval_bool(op, scope, left, right):
+    if left.get_type() == InterpreterBase.INT_DEF:
+        left = left.converted_type(InterpreterBase.BOOL_DEF)
+    elif left.get_type() != InterpreterBase.BOOL_DEF:
+        scope.error(
             ErrorType.TYPE_ERROR,
-            f"Cannot add {self.left.get_type()} and {self.right.get_type()}",
+            "Cannot perform boolean operations on non-boolean values",
         )
-
-    def __eval_sub(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type and left_type == InterpreterBase.INT_DEF:
-            return Value(self.left.get_val() - self.right.get_val())
-        self.scope.error(
+    if right.get_type() == InterpreterBase.INT_DEF:
+        right = right.converted_type(InterpreterBase.BOOL_DEF)
+    elif right.get_type() != InterpreterBase.BOOL_DEF:
+        scope.error(
             ErrorType.TYPE_ERROR,
-            f"Cannot subtract {self.left.get_type()} and {self.right.get_type()}",
+            "Cannot perform boolean operations on non-boolean values",
         )
+    if op == AND:
+        return _eval_and(left, right)
+    elif op == OR:
+        return _eval_or(left, right)
 
-    def __eval_mul(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type and left_type == InterpreterBase.INT_DEF:
-            return Value(self.left.get_val() * self.right.get_val())
-        self.scope.error(
-            ErrorType.TYPE_ERROR,
-            f"Cannot multiply {self.left.get_type()} and {self.right.get_type()}",
+
+def _eval_and(left, right):
+    return make_value(left.get_val() and right.get_val())
+
+
+def _eval_or(left, right):
+    return make_value(left.get_val() or right.get_val())
+
+
+def _eval_arith(op, scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == InterpreterBase.NIL_DEF or right_type == InterpreterBase.NIL_DEF:
+        scope.error(ErrorType.TYPE_ERROR, "Cannot perform arithmetic on nil")
+    # Converting bools to ints
+    if left_type == InterpreterBase.BOOL_DEF:
+        left = left.converted_type(InterpreterBase.INT_DEF)
+        left_type = InterpreterBase.INT_DEF
+    if right_type == InterpreterBase.BOOL_DEF:
+        right = right.converted_type(InterpreterBase.INT_DEF)
+        right_type = InterpreterBase.INT_DEF
+
+    if op == ADD:
+        return _eval_add(scope, left, right)
+    elif op == SUBTRACT:
+        return _eval_sub(scope, left, right)
+    elif op == MULTIPLY:
+        return _eval_mul(scope, left, right)
+    elif op == DIVIDE:
+        return _eval_div(scope, left, right)
+    raise Exception(f"Unknown arithmetic operator {op}")
+
+
+def _eval_add(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    # We add either 2 ints or 2 strings
+    if (
+        left_type == right_type
+        and (
+            left_type == InterpreterBase.INT_DEF
+            or left_type == InterpreterBase.STRING_DEF
         )
+    ) or (
+        left.get_type() == InterpreterBase.STRING_DEF
+        and right.get_type() == InterpreterBase.STRING_DEF
+    ):
+        return make_value(left.get_val() + right.get_val())
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot add {left.get_type()} and {right.get_type()}",
+    )
 
-    def __eval_div(self):
-        left_type = self.left.get_type()
-        right_type = self.right.get_type()
-        if left_type == right_type and left_type == InterpreterBase.INT_DEF:
-            return Value(int(self.left.get_val() // self.right.get_val()))
-        self.scope.error(
-            ErrorType.TYPE_ERROR,
-            f"Cannot divide {self.left.get_type()} and {self.right.get_type()}",
+
+def _eval_sub(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type and left_type == InterpreterBase.INT_DEF:
+        return make_value(left.get_val() - right.get_val())
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot subtract {left.get_type()} and {right.get_type()}",
+    )
+
+
+def _eval_mul(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type and left_type == InterpreterBase.INT_DEF:
+        return make_value(left.get_val() * right.get_val())
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot multiply {left.get_type()} and {right.get_type()}",
+    )
+
+
+def _eval_div(scope, left, right):
+    left_type = left.get_type()
+    right_type = right.get_type()
+    if left_type == right_type and left_type == InterpreterBase.INT_DEF:
+        return make_value(int(left.get_val() // right.get_val()))
+    scope.error(
+        ErrorType.TYPE_ERROR,
+        f"Cannot divide {left.get_type()} and {right.get_type()}",
+    )
+
+
+# Operand types each operator can be applied to directly, without converting
+# either operand, and the function applied to their values. Everything else
+# goes through _eval_general
+_DIRECT_OPERATIONS = {
+    ADD: {
+        (InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.add,
+        (InterpreterBase.STRING_DEF, InterpreterBase.STRING_DEF): operator.add,
+    },
+    SUBTRACT: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.sub},
+    MULTIPLY: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.mul},
+    DIVIDE: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.floordiv},
+    LESS_THAN: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.lt},
+    LESS_THAN_EQUALS: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.le},
+    GREATER_THAN: {(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.gt},
+    GREATER_THAN_EQUALS: {
+        (InterpreterBase.INT_DEF, InterpreterBase.INT_DEF): operator.ge
+    },
+    AND: {(InterpreterBase.BOOL_DEF, InterpreterBase.BOOL_DEF): operator.and_},
+    OR: {(InterpreterBase.BOOL_DEF, InterpreterBase.BOOL_DEF): operator.or_},
+}
+# Values of the same primitive type are equal if their values are
+for _op, _function in ((EQUALS, operator.eq), (NOT_EQUALS, operator.ne)):
+    _DIRECT_OPERATIONS[_op] = {
+        (value_type, value_type): _function
+        for value_type in (
+            InterpreterBase.INT_DEF,
+            InterpreterBase.BOOL_DEF,
+            InterpreterBase.STRING_DEF,
+            InterpreterBase.NIL_DEF,
         )
+    }
 
-    def __str__(self):
-        return f"BinaryOperator({self.type}, {str(self.left)}, {str(self.right)})"
+
+def _make_handler(function):
+    def handler(left, right):
+        return make_value(function(left.get_val(), right.get_val()))
+
+    return handler
+
+
+# Every binary operator's handlers, by the types of its left and right operands
+HANDLERS = {
+    op: {
+        operand_types: _make_handler(function)
+        for operand_types, function in _DIRECT_OPERATIONS.get(op, {}).items()
+    }
+    for op in BINARY_OPERATORS
+}
+
+# What each operator quickened for int operands applies to their values, and
+# the type of the result
+INT_OPERATIONS = {
+    op: (
+        operations[(InterpreterBase.INT_DEF, InterpreterBase.INT_DEF)],
+        InterpreterBase.BOOL_DEF if op in BINARY_COMP else InterpreterBase.INT_DEF,
+    )
+    for op, operations in _DIRECT_OPERATIONS.items()
+    if (InterpreterBase.INT_DEF, InterpreterBase.INT_DEF) in operations
+}
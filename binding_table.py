@@ -0,0 +1,59 @@
+class BindingTable:
+    """Shallow binding for the dynamically scoped chain of active scopes.
+
+    Every scope entered on top of the current innermost scope is pushed here,
+    and each name maps to a stack of (depth, scope) entries for the scopes
+    that bind it, innermost last. Looking a name up from the innermost scope
+    is then a single dict access instead of a walk over every active frame.
+    """
+
+    def __init__(self, base_scope):
+        self.scopes = [base_scope]
+        self.names = [[]]
+        self.bindings = {}
+
+    def enter(self, scope):
+        self.scopes.append(scope)
+        self.names.append([])
+
+    # Pops scope along with anything entered after it that wasn't left yet
+    # (e.g. the blocks a return jumped out of). Popped scopes stop using the
+    # table and fall back to walking their parents
+    def leave(self, scope):
+        while len(self.scopes) > 1:
+            top = self.scopes.pop()
+            top.bindings = None
+            for name in self.names.pop():
+                stack = self.bindings[name]
+                stack.pop()
+                if not stack:
+                    del self.bindings[name]
+            if top is scope:
+                return
+
+    # Pops everything entered after scope that wasn't left yet, scope must be
+    # on the table
+    def leave_above(self, scope):
+        while self.scopes[-1] is not scope:
+            self.leave(self.scopes[-1])
+
+    # Records that scope now binds name, scope must be on the table
+    def bind(self, scope, name):
+        depth = len(self.scopes) - 1
+        while self.scopes[depth] is not scope:
+            depth -= 1
+        self.names[depth].append(name)
+        stack = self.bindings.setdefault(name, [])
+        # Names are normally bound in the innermost scope, but keep the stack
+        # ordered by depth if an outer scope gains a binding
+        position = len(stack)
+        while position > 0 and stack[position - 1][0] > depth:
+            position -= 1
+        stack.insert(position, (depth, scope))
+
+    # The innermost scope binding name, or None if no active scope does
+    def lookup(self, name):
+        stack = self.bindings.get(name)
+        if not stack:
+            return None
+        return stack[-1][1]
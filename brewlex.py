@@ -1,4 +1,5 @@
-from ply import lex
+import sys
+import threading
 
 reserved = (
     "FUNC",
@@ -126,5 +127,18 @@ def t_error(t):
     t.lexer.skip(1)
 
 
-# Build the lexer
-lex.lex()
+# PLY is only imported and the lexer only built the first time it's needed,
+# so importing this module stays cheap. Lexers keep their position, so every
+# user gets a clone of this one
+_lexer = None
+_lexer_lock = threading.Lock()
+
+
+def get_lexer():
+    global _lexer
+    with _lexer_lock:
+        if _lexer is None:
+            from ply import lex
+
+            _lexer = lex.lex(module=sys.modules[__name__])
+    return _lexer.clone()
@@ -1,7 +1,9 @@
 from element import Element
 from brewlex import *
 from intbase import InterpreterBase
-from ply import yacc
+import sys
+import threading
+from copy import copy
 
 # Parsing rules
 
@@ -233,13 +235,59 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
-# exported function
+# PLY is only imported and the parser only built by the first parse, from the
+# prebuilt tables in parsetab.py. No files are written - run this module to
+# regenerate the tables (and parser.out) after changing the grammar
+_parser = None
+_parser_lock = threading.Lock()
+
+
+# A parser keeps its stacks on itself while parsing, so every user gets a
+# copy of this one sharing its (read only) tables
+def get_parser():
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            from ply import yacc
+
+            _parser = yacc.yacc(
+                module=sys.modules[__name__], debug=False, write_tables=False
+            )
+    return copy(_parser)
+
+
+class Parser:
+    """A parser with its own PLY lexer and parser state.
+
+    Separate Parser objects can parse at the same time, e.g. one per thread.
+    Each parse starts over from the first line of the program.
+    """
+
+    def __init__(self):
+        self.lexer = get_lexer()
+        self.parser = get_parser()
+
+    def parse_program(self, program):
+        self.lexer.lineno = 1
+        ast = self.parser.parse(program, lexer=self.lexer)
+        if ast is None:
+            raise SyntaxError("Syntax error")
+        return ast
+
+
+_thread_parsers = threading.local()
+
+
+# exported function, every thread parses with a Parser of its own
 def parse_program(program):
-    ast = yacc.parse(program)
-    if ast is None:
-        raise SyntaxError("Syntax error")
-    return ast
+    parser = getattr(_thread_parsers, "parser", None)
+    if parser is None:
+        parser = Parser()
+        _thread_parsers.parser = parser
+    return parser.parse_program(program)
+
 
+if __name__ == "__main__":
+    from ply import yacc
 
-# generate our parser
-yacc.yacc()
+    yacc.yacc(module=sys.modules[__name__])
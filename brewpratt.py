@@ -0,0 +1,342 @@
+"""Hand-written tokenizer and Pratt parser for Brewin.
+
+Accepts the same grammar as brewparse/brewlex and builds the same Element
+trees, without PLY. Statements are parsed by recursive descent and
+expressions by precedence climbing over the precedence table of brewparse.
+
+Syntax errors print the same message as brewparse and raise SyntaxError. PLY
+would go on to skip tokens and retry from the start state, so unlike
+brewparse this never returns a tree built from the rest of a broken program.
+"""
+
+import re
+from element import Element
+from intbase import InterpreterBase
+
+RESERVED = {
+    "func": "FUNC",
+    "if": "IF",
+    "else": "ELSE",
+    "while": "WHILE",
+    "return": "RETURN",
+    "true": "TRUE",
+    "false": "FALSE",
+    "nil": "NIL",
+    "lambda": "LAMBDA",
+    "ref": "REF",
+}
+
+OPERATOR_TOKENS = {
+    "(": "LPAREN",
+    ")": "RPAREN",
+    "{": "LBRACE",
+    "}": "RBRACE",
+    ",": "COMMA",
+    ".": "DOT",
+    ";": "SEMI",
+    "==": "EQ",
+    ">=": "GREATER_EQ",
+    ">": "GREATER",
+    "<=": "LESS_EQ",
+    "<": "LESS",
+    "!=": "NOT_EQ",
+    "=": "ASSIGN",
+    "+": "PLUS",
+    "-": "MINUS",
+    "*": "MULTIPLY",
+    "/": "DIVIDE",
+    "@": "AT",
+    "&&": "AND",
+    "||": "OR",
+    "!": "NOT",
+}
+
+# Same order as the PLY master pattern - ignored characters, rules defined as
+# functions, then the fixed tokens, longest first. Anything else is illegal
+TOKEN_PATTERN = re.compile(
+    r"(?P<ignore>[ \t]+)"
+    r"|(?P<NUMBER>\d+)"
+    r"|(?P<NAME>[A-Za-z_][\w_]*)"
+    r"|(?P<newline>\n+)"
+    r"|(?P<comment>/\*[\s\S]*?\*/)"
+    r'|(?P<STRING>".*?")'
+    r"|(?P<OPERATOR>\|\||>=|<=|==|!=|&&|[(){},.;><=+\-*/@!])"
+    r"|(?P<illegal>[\s\S])"
+)
+
+# Binding power of each binary operator, a higher one binds tighter
+BINARY_PRECEDENCE = {
+    "OR": 1,
+    "AND": 2,
+    "GREATER_EQ": 3,
+    "GREATER": 3,
+    "LESS_EQ": 3,
+    "LESS": 3,
+    "EQ": 3,
+    "NOT_EQ": 3,
+    "PLUS": 4,
+    "MINUS": 4,
+    "MULTIPLY": 5,
+    "DIVIDE": 5,
+}
+
+# Unary minus and not bind tighter than every binary operator
+UNARY_PRECEDENCE = 6
+
+END = "$end"
+
+# The most tokens the parser looks ahead by
+LOOKAHEAD = 4
+
+
+# The kind and value of every token, in two parallel lists
+def tokenize(program):
+    kinds = []
+    values = []
+    for found in TOKEN_PATTERN.finditer(program):
+        kind = found.lastgroup
+        if kind == "ignore":
+            continue
+        text = found.group()
+        if kind == "NAME":
+            kinds.append(RESERVED.get(text, "NAME"))
+            values.append(text)
+        elif kind == "OPERATOR":
+            kinds.append(OPERATOR_TOKENS[text])
+            values.append(text)
+        elif kind == "NUMBER":
+            kinds.append("NUMBER")
+            values.append(int(text))
+        elif kind == "STRING":
+            kinds.append("STRING")
+            values.append(text[1:-1])
+        elif kind == "illegal":
+            # Quotes that don't start a string are a literal, like in brewlex
+            if text == '"':
+                kinds.append(text)
+                values.append(text)
+            else:
+                print(f"Illegal character {text}")
+    # Padded so looking a few tokens ahead never runs off the end
+    kinds.extend([END] * LOOKAHEAD)
+    values.extend([None] * LOOKAHEAD)
+    return kinds, values
+
+
+class PrattParser:
+    def __init__(self, kinds, values):
+        self.kinds = kinds
+        self.values = values
+        self.pos = 0
+
+    def parse_program(self):
+        functions = [self.__parse_func()]
+        while self.kinds[self.pos] == "FUNC":
+            functions.append(self.__parse_func())
+        self.__expect(END)
+        return Element(InterpreterBase.PROGRAM_DEF, functions=functions)
+
+    def __expect(self, kind):
+        pos = self.pos
+        if self.kinds[pos] != kind:
+            self.__error()
+        self.pos = pos + 1
+        return self.values[pos]
+
+    def __error(self):
+        kind = self.kinds[self.pos]
+        if kind == END:
+            print("Syntax error at EOF")
+        else:
+            print(f"Syntax error at '{self.values[self.pos]}'")
+        raise SyntaxError("Syntax error")
+
+    def __parse_func(self):
+        self.__expect("FUNC")
+        name = self.__expect("NAME")
+        args = self.__parse_formal_args()
+        statements = self.__parse_block()
+        return Element(
+            InterpreterBase.FUNC_DEF, name=name, args=args, statements=statements
+        )
+
+    def __parse_lambda(self):
+        self.__expect("LAMBDA")
+        args = self.__parse_formal_args()
+        statements = self.__parse_block()
+        return Element(InterpreterBase.LAMBDA_DEF, args=args, statements=statements)
+
+    def __parse_formal_args(self):
+        self.__expect("LPAREN")
+        args = []
+        if self.kinds[self.pos] != "RPAREN":
+            args.append(self.__parse_formal_arg())
+            while self.kinds[self.pos] == "COMMA":
+                self.pos += 1
+                args.append(self.__parse_formal_arg())
+        self.__expect("RPAREN")
+        return args
+
+    def __parse_formal_arg(self):
+        if self.kinds[self.pos] == "REF":
+            self.pos += 1
+            return Element(InterpreterBase.REFARG_DEF, name=self.__expect("NAME"))
+        return Element(InterpreterBase.ARG_DEF, name=self.__expect("NAME"))
+
+    # Blocks always hold at least one statement
+    def __parse_block(self):
+        self.__expect("LBRACE")
+        statements = [self.__parse_statement()]
+        while self.kinds[self.pos] != "RBRACE":
+            statements.append(self.__parse_statement())
+        self.pos += 1
+        return statements
+
+    def __parse_statement(self):
+        kind = self.kinds[self.pos]
+        if kind == "IF":
+            return self.__parse_if()
+        if kind == "WHILE":
+            self.pos += 1
+            condition = self.__parse_condition()
+            statements = self.__parse_block()
+            return Element(
+                InterpreterBase.WHILE_DEF, condition=condition, statements=statements
+            )
+        if kind == "RETURN":
+            self.pos += 1
+            expression = None
+            if self.kinds[self.pos] != "SEMI":
+                expression = self.__parse_expression(0)
+            self.__expect("SEMI")
+            return Element(InterpreterBase.RETURN_DEF, expression=expression)
+        if kind == "NAME" and self.__is_assignment():
+            name = self.__parse_variable()
+            self.__expect("ASSIGN")
+            expression = self.__parse_expression(0)
+            self.__expect("SEMI")
+            return Element("=", name=name, expression=expression)
+        expression = self.__parse_expression(0)
+        self.__expect("SEMI")
+        return expression
+
+    def __is_assignment(self):
+        if self.kinds[self.pos + 1] == "ASSIGN":
+            return True
+        return (
+            self.kinds[self.pos + 1] == "DOT"
+            and self.kinds[self.pos + 2] == "NAME"
+            and self.kinds[self.pos + 3] == "ASSIGN"
+        )
+
+    def __parse_if(self):
+        self.pos += 1
+        condition = self.__parse_condition()
+        statements = self.__parse_block()
+        else_statements = None
+        if self.kinds[self.pos] == "ELSE":
+            self.pos += 1
+            else_statements = self.__parse_block()
+        return Element(
+            InterpreterBase.IF_DEF,
+            condition=condition,
+            statements=statements,
+            else_statements=else_statements,
+        )
+
+    def __parse_condition(self):
+        self.__expect("LPAREN")
+        condition = self.__parse_expression(0)
+        self.__expect("RPAREN")
+        return condition
+
+    # Parses operators binding tighter than min_precedence, all of them are
+    # left associative
+    def __parse_expression(self, min_precedence):
+        left = self.__parse_prefix()
+        while True:
+            kind = self.kinds[self.pos]
+            precedence = BINARY_PRECEDENCE.get(kind)
+            if precedence is None or precedence <= min_precedence:
+                return left
+            value = self.values[self.pos]
+            self.pos += 1
+            right = self.__parse_expression(precedence)
+            left = Element(value, op1=left, op2=right)
+
+    def __parse_prefix(self):
+        pos = self.pos
+        kind = self.kinds[pos]
+        value = self.values[pos]
+        self.pos = pos + 1
+        if kind == "NUMBER":
+            return Element(InterpreterBase.INT_DEF, val=value)
+        if kind == "NAME":
+            return self.__parse_name(value)
+        if kind == "STRING":
+            return Element(InterpreterBase.STRING_DEF, val=value)
+        if kind == "LPAREN":
+            expression = self.__parse_expression(0)
+            self.__expect("RPAREN")
+            return expression
+        if kind == "MINUS":
+            operand = self.__parse_expression(UNARY_PRECEDENCE - 1)
+            return Element(InterpreterBase.NEG_DEF, op1=operand)
+        if kind == "NOT":
+            operand = self.__parse_expression(UNARY_PRECEDENCE - 1)
+            return Element(InterpreterBase.NOT_DEF, op1=operand)
+        if kind == "TRUE" or kind == "FALSE":
+            return Element(
+                InterpreterBase.BOOL_DEF, val=value == InterpreterBase.TRUE_DEF
+            )
+        if kind == "NIL":
+            return Element(InterpreterBase.NIL_DEF)
+        if kind == "AT":
+            return Element(InterpreterBase.OBJ_DEF)
+        if kind == "LAMBDA":
+            self.pos -= 1
+            return self.__parse_lambda()
+        self.pos -= 1
+        self.__error()
+
+    # Variables, function calls and method calls all start with a name
+    def __parse_name(self, name):
+        if self.kinds[self.pos] == "LPAREN":
+            return Element(
+                InterpreterBase.FCALL_DEF, name=name, args=self.__parse_args()
+            )
+        if self.kinds[self.pos] != "DOT":
+            return Element(InterpreterBase.VAR_DEF, name=name)
+        self.pos += 1
+        field = self.__expect("NAME")
+        if self.kinds[self.pos] == "LPAREN":
+            return Element(
+                InterpreterBase.MCALL_DEF,
+                objref=name,
+                name=field,
+                args=self.__parse_args(),
+            )
+        return Element(InterpreterBase.VAR_DEF, name=name + "." + field)
+
+    def __parse_variable(self):
+        name = self.__expect("NAME")
+        if self.kinds[self.pos] == "DOT":
+            self.pos += 1
+            name += "." + self.__expect("NAME")
+        return name
+
+    def __parse_args(self):
+        self.__expect("LPAREN")
+        args = []
+        if self.kinds[self.pos] != "RPAREN":
+            args.append(self.__parse_expression(0))
+            while self.kinds[self.pos] == "COMMA":
+                self.pos += 1
+                args.append(self.__parse_expression(0))
+        self.__expect("RPAREN")
+        return args
+
+
+# exported function, a drop-in replacement for brewparse.parse_program
+def parse_program(program):
+    return PrattParser(*tokenize(program)).parse_program()
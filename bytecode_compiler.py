@@ -0,0 +1,287 @@
+from intbase import InterpreterBase
+from constants import *
+from element import Element
+from value import Value, NIL
+import convert_element
+from resolver import resolve_function, find_free_names
+from function_template import FunctionTemplate
+from field_cache import FieldCache
+from call_cache import CallCache
+from binary_operator import INT_OPERATIONS
+
+# Opcodes - every instruction is an (opcode, operand) pair. The last operand of
+# LOAD_FIELD and RESOLVE_METHOD is the FieldCache of the instruction, and the
+# last one of RESOLVE its CallCache
+CONST = 0  # push operand
+LOAD_VAR = 1  # push the value of variable operand
+LOAD_FIELD = 2  # push field operand[1] of the object in variable operand[0]
+STORE_VAR = 3  # pop a value into variable operand
+STORE_FIELD = 4  # pop a value into field operand[1] of variable operand[0]
+BINARY = 5  # push binary operator operand[0] of two popped values, or of one and
+# the constant operand[1] if it isn't None. operand[2] is the operator's
+# INT_OPERATIONS entry, None if it has none
+UNARY = 6  # pop a value, push the result of unary operator operand
+POP = 7  # discard the top of the stack
+JUMP = 8  # continue at instruction operand
+JUMP_IF_FALSE = 9  # pop a condition, continue at operand if it is false
+ENTER_SCOPE = 10  # start a new block scope
+EXIT_SCOPE = 11  # leave the current block scope
+RESOLVE = 12  # push the function called operand[0] taking operand[1] args
+RESOLVE_METHOD = 13  # push method operand[1] of object operand[0] (operand[2] args)
+ARG_VAR = 14  # push variable operand[0] as argument operand[1], by ref if needed
+ARG_COPY = 15  # replace the top of the stack with a copy of it
+CALL = 16  # call the resolved function with the top operand arguments
+FORMAT = 17  # replace the top of the stack with its printed form
+OUTPUT = 18  # output the top operand formatted strings
+INPUT = 19  # call inputi/inputs operand[0] with operand[1] formatted prompts
+MAKE_LAMBDA = 20  # push a closure of the code object operand
+NEW_OBJECT = 21  # push a new empty object
+RETURN = 22  # pop the return value and leave the function
+LOAD_SLOT = 23  # push the argument at (depth, slot) address operand
+STORE_SLOT = 24  # pop a value into the argument at (depth, slot) address operand
+TAIL_CALL = 25  # CALL, in place of the function when it can be (a RETURN follows)
+
+OPCODE_NAMES = {
+    CONST: "CONST",
+    LOAD_VAR: "LOAD_VAR",
+    LOAD_FIELD: "LOAD_FIELD",
+    STORE_VAR: "STORE_VAR",
+    STORE_FIELD: "STORE_FIELD",
+    BINARY: "BINARY",
+    UNARY: "UNARY",
+    POP: "POP",
+    JUMP: "JUMP",
+    JUMP_IF_FALSE: "JUMP_IF_FALSE",
+    ENTER_SCOPE: "ENTER_SCOPE",
+    EXIT_SCOPE: "EXIT_SCOPE",
+    RESOLVE: "RESOLVE",
+    RESOLVE_METHOD: "RESOLVE_METHOD",
+    ARG_VAR: "ARG_VAR",
+    ARG_COPY: "ARG_COPY",
+    CALL: "CALL",
+    FORMAT: "FORMAT",
+    OUTPUT: "OUTPUT",
+    INPUT: "INPUT",
+    MAKE_LAMBDA: "MAKE_LAMBDA",
+    NEW_OBJECT: "NEW_OBJECT",
+    RETURN: "RETURN",
+    LOAD_SLOT: "LOAD_SLOT",
+    STORE_SLOT: "STORE_SLOT",
+    TAIL_CALL: "TAIL_CALL",
+}
+
+
+# The template of a compiled function, with instructions in place of statements.
+# free_names and calls are what find_free_names found in the function
+class CodeObject(FunctionTemplate):
+    def __init__(self, name, args, instructions, free_names=(), calls=()):
+        self.name = name
+        self.args = args
+        self.arg_names = [arg.get_name() for arg in args]
+        self.instructions = instructions
+        self.free_names = free_names
+        self.calls = calls
+        self.outside_names = None
+        self.outside_names_found = False
+
+    def get_args(self):
+        return self.args
+
+    def __str__(self):
+        lines = [f"CodeObject {self.name}:"]
+        for index, (opcode, operand) in enumerate(self.instructions):
+            if opcode == BINARY:
+                op, constant, _ = operand
+                operand = op if constant is None else f"{op} {str(constant)}"
+            lines.append(f"{index:4} {OPCODE_NAMES[opcode]:16} {str(operand)}")
+        return "\n".join(lines)
+
+
+class BytecodeCompiler:
+    # Traces what it compiles if interpreter traces its run
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        # What resolve_function found in every function compiled so far. The
+        # body of a lambda is resolved on its own, so no Element is in two
+        self.addresses = {}
+
+    def compile_function(self, element):
+        if (
+            element.elem_type != InterpreterBase.FUNC_DEF
+            and element.elem_type != InterpreterBase.LAMBDA_DEF
+        ):
+            raise Exception(f"Expected function definition, got {element.elem_type}")
+        self.addresses.update(resolve_function(element))
+        args = [convert_element.convert_element(arg) for arg in element.get(ARGS)]
+        instructions = []
+        self.__compile_statements(element.get(STATEMENTS), instructions)
+        # Falling off the end of a function returns nil
+        instructions.append((CONST, NIL))
+        instructions.append((RETURN, None))
+        free_names, calls = find_free_names(element)
+        code = CodeObject(element.get(NAME), args, instructions, free_names, calls)
+        if self.interpreter.trace_output:
+            print(str(code))
+        return code
+
+    # Code that calls main from the global scope
+    def compile_entry(self):
+        return CodeObject(
+            None,
+            [],
+            [(RESOLVE, (MAIN_FUNC_NAME, 0, CallCache())), (CALL, 0), (RETURN, None)],
+        )
+
+    def __compile_statements(self, statements, instructions):
+        for statement in statements:
+            self.__compile_statement(statement, instructions)
+
+    def __compile_statement(self, statement, instructions):
+        elem_type = statement.elem_type
+        if elem_type == ASSIGNMENT:
+            self.__compile_expression(statement.get(EXPRESSION), instructions)
+            name = statement.get(NAME)
+            if "." in name:
+                instructions.append((STORE_FIELD, tuple(name.split("."))))
+            elif statement in self.addresses:
+                instructions.append((STORE_SLOT, self.addresses[statement]))
+            else:
+                instructions.append((STORE_VAR, name))
+        elif elem_type == InterpreterBase.IF_DEF:
+            self.__compile_if(statement, instructions)
+        elif elem_type == InterpreterBase.WHILE_DEF:
+            self.__compile_while(statement, instructions)
+        elif elem_type == InterpreterBase.RETURN_DEF:
+            expression = statement.get(EXPRESSION)
+            if expression is None:
+                instructions.append((CONST, NIL))
+                instructions.append((RETURN, None))
+            elif (
+                expression.elem_type == InterpreterBase.FCALL_DEF
+                and expression.get(NAME) not in PRELOADED_FUNCS
+            ):
+                self.__compile_call(expression, instructions, TAIL_CALL)
+            else:
+                self.__compile_expression(expression, instructions)
+            instructions.append((RETURN, None))
+        else:
+            self.__compile_expression(statement, instructions)
+            instructions.append((POP, None))
+
+    # The condition and both branches share one block scope, like Conditional
+    def __compile_if(self, statement, instructions):
+        instructions.append((ENTER_SCOPE, None))
+        self.__compile_expression(statement.get(CONDITION), instructions)
+        branch = len(instructions)
+        instructions.append(None)
+        self.__compile_statements(statement.get(STATEMENTS), instructions)
+        else_statements = statement.get(ELSE_STATEMENTS)
+        if else_statements is None:
+            instructions[branch] = (JUMP_IF_FALSE, len(instructions))
+        else:
+            jump = len(instructions)
+            instructions.append(None)
+            instructions[branch] = (JUMP_IF_FALSE, len(instructions))
+            self.__compile_statements(else_statements, instructions)
+            instructions[jump] = (JUMP, len(instructions))
+        instructions.append((EXIT_SCOPE, None))
+
+    # Every iteration of a loop runs in the same block scope
+    def __compile_while(self, statement, instructions):
+        instructions.append((ENTER_SCOPE, None))
+        start = len(instructions)
+        self.__compile_expression(statement.get(CONDITION), instructions)
+        branch = len(instructions)
+        instructions.append(None)
+        self.__compile_statements(statement.get(STATEMENTS), instructions)
+        instructions.append((JUMP, start))
+        instructions[branch] = (JUMP_IF_FALSE, len(instructions))
+        instructions.append((EXIT_SCOPE, None))
+
+    def __compile_expression(self, expression, instructions):
+        if type(expression) != Element:
+            raise Exception(f"Expected Element, got {type(expression)}")
+        elem_type = expression.elem_type
+        if elem_type in VALUE_TYPES:
+            instructions.append((CONST, Value(expression)))
+        elif elem_type == InterpreterBase.VAR_DEF:
+            name = expression.get(NAME)
+            if "." in name:
+                obj_name, field = name.split(".")
+                instructions.append((LOAD_FIELD, (obj_name, field, FieldCache())))
+            elif expression in self.addresses:
+                instructions.append((LOAD_SLOT, self.addresses[expression]))
+            else:
+                instructions.append((LOAD_VAR, name))
+        elif elem_type in BINARY_OPERATORS:
+            self.__compile_expression(expression.get(OPERAND_1), instructions)
+            right = expression.get(OPERAND_2)
+            int_operation = INT_OPERATIONS.get(elem_type)
+            # A constant right operand is kept in the instruction, not pushed
+            if right.elem_type in VALUE_TYPES:
+                operand = (elem_type, Value(right), int_operation)
+            else:
+                self.__compile_expression(right, instructions)
+                operand = (elem_type, None, int_operation)
+            instructions.append((BINARY, operand))
+        elif elem_type in UNARY_OPERATORS:
+            self.__compile_expression(expression.get(OPERAND_1), instructions)
+            instructions.append((UNARY, elem_type))
+        elif elem_type == InterpreterBase.FCALL_DEF:
+            self.__compile_call(expression, instructions)
+        elif elem_type == InterpreterBase.MCALL_DEF:
+            args = expression.get(ARGS)
+            operand = (
+                expression.get(OBJREF),
+                expression.get(NAME),
+                len(args),
+                FieldCache(),
+            )
+            instructions.append((RESOLVE_METHOD, operand))
+            self.__compile_args(args, instructions)
+            instructions.append((CALL, len(args)))
+        elif elem_type == InterpreterBase.LAMBDA_DEF:
+            instructions.append((MAKE_LAMBDA, self.compile_function(expression)))
+        elif elem_type == InterpreterBase.OBJ_DEF:
+            instructions.append((NEW_OBJECT, expression))
+        else:
+            raise Exception(f"Unknown element type {elem_type}")
+
+    # call_opcode is what calls a function once it's resolved, CALL or TAIL_CALL
+    def __compile_call(self, expression, instructions, call_opcode=CALL):
+        name = expression.get(NAME)
+        args = expression.get(ARGS)
+        if name == PRINT:
+            self.__compile_formatted(args, instructions)
+            instructions.append((OUTPUT, len(args)))
+        elif name in INPUT_TAKERS:
+            # Too many arguments is reported before any of them are evaluated
+            if len(args) <= 1:
+                self.__compile_formatted(args, instructions)
+            instructions.append((INPUT, (name, len(args))))
+        else:
+            instructions.append((RESOLVE, (name, len(args), CallCache())))
+            self.__compile_args(args, instructions)
+            instructions.append((call_opcode, len(args)))
+
+    def __compile_formatted(self, args, instructions):
+        for arg in args:
+            self.__compile_expression(arg, instructions)
+            instructions.append((FORMAT, None))
+
+    # Plain variables may be bound by reference, which is only known once the
+    # callee has been resolved at runtime
+    def __compile_args(self, args, instructions):
+        for index, arg in enumerate(args):
+            name = arg.get(NAME)
+            if arg.elem_type == InterpreterBase.VAR_DEF and "." not in name:
+                instructions.append((ARG_VAR, (name, index)))
+            else:
+                self.__compile_expression(arg, instructions)
+                # Operators only give Values, which are never copied
+                if (
+                    arg.elem_type not in BINARY_OPERATORS
+                    and arg.elem_type not in UNARY_OPERATORS
+                    and arg.elem_type not in VALUE_TYPES
+                ):
+                    instructions.append((ARG_COPY, None))
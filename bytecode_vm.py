@@ -0,0 +1,275 @@
+from intbase import InterpreterBase, ErrorType
+from constants import *
+from bytecode_compiler import *
+from function_def import FunctionDef
+from lambda_def import LambdaDef
+from object_def import ObjectDef
+from value import Value, TRUE, FALSE
+import binary_operator
+import unary_operator
+import ownership
+
+
+class CompiledFunction(FunctionDef):
+    __slots__ = ("code",)
+
+    def __init__(self, code):
+        self.template = code
+        self.code = code
+
+
+class CompiledLambda(LambdaDef):
+    __slots__ = ("code",)
+
+    def __init__(self, scope, code):
+        super().__init__(scope, code)
+        self.code = code
+
+
+class BytecodeVM:
+    """Runs compiled programs on an explicit stack of frames.
+
+    A call saves the caller's state on a list and the callee runs in the same
+    loop, so Brewin recursion never recurses in Python. Its depth is limited
+    by max_call_depth instead, the most frames the list may hold. A call past
+    it is a CALL_DEPTH_ERROR.
+    """
+
+    def __init__(self, max_call_depth=MAX_CALL_DEPTH):
+        self.max_call_depth = max_call_depth
+        self.compiler = None
+
+    def run(self, root_node, base_scope):
+        self.compiler = BytecodeCompiler(base_scope.interpreter)
+        for function in root_node.get(FUNCTIONS):
+            code = self.compiler.compile_function(function)
+            base_scope.add_new_func(CompiledFunction(code), function.get(NAME))
+        self.execute(self.compiler.compile_entry(), base_scope)
+
+    # Runs a code object to completion and returns its return value. The
+    # running function's state is kept in locals, a call pushes the caller's
+    # onto frames and a return pops it back. frame_scope is the scope holding
+    # the function's arguments, call_scope the one it was called from and
+    # parent_scope the one above frame_scope
+    def execute(self, code, scope):
+        instructions = code.instructions
+        stack = []
+        pc = 0
+        frame_scope = call_scope = parent_scope = None
+        frames = []
+        while True:
+            opcode, operand = instructions[pc]
+            pc += 1
+            # Branches are ordered by how often the benchmarks run them
+            if opcode == BINARY:
+                op, right, int_operation = operand
+                if right is None:
+                    right = stack.pop()
+                left = stack[-1]
+                if (
+                    int_operation is not None
+                    and type(left) is Value
+                    and type(right) is Value
+                    and type(left.value) is int
+                    and type(right.value) is int
+                ):
+                    stack[-1] = Value.of_type(
+                        int_operation[0](left.value, right.value), int_operation[1]
+                    )
+                else:
+                    stack[-1] = binary_operator.operate(op, scope, left, right)
+            elif opcode == LOAD_VAR:
+                stack.append(scope.get_var(operand))
+            elif opcode == STORE_VAR:
+                scope.set_var(operand, stack.pop())
+            elif opcode == LOAD_SLOT:
+                # Arguments are always in the frame's own scope
+                stack.append(frame_scope.slots[operand[1]].value)
+            elif opcode == JUMP_IF_FALSE:
+                condition = stack.pop()
+                # Comparisons give the shared TRUE and FALSE
+                if condition is TRUE:
+                    continue
+                if condition is FALSE:
+                    pc = operand
+                    continue
+                if (
+                    condition.get_type() != InterpreterBase.BOOL_DEF
+                    and condition.get_type() != InterpreterBase.INT_DEF
+                ):
+                    scope.error(
+                        ErrorType.TYPE_ERROR,
+                        f"Expected boolean or int, got {condition.get_type()}",
+                    )
+                if not condition.get_val():
+                    pc = operand
+            elif opcode == ARG_COPY:
+                stack[-1] = stack[-1].copy()
+            elif opcode == JUMP:
+                pc = operand
+            elif opcode == RESOLVE:
+                name, num_args, cache = operand
+                func = scope.get_func(name, num_args, cache)
+                self.__check_num_args(scope, func, num_args)
+                stack.append(None)
+                stack.append(func)
+            elif opcode == CONST:
+                stack.append(operand)
+            elif opcode == ENTER_SCOPE:
+                scope = scope.make_child_scope()
+            elif opcode == STORE_FIELD:
+                value = stack.pop()
+                var = scope.get_var(operand[0])
+                if var.get_type() != InterpreterBase.OBJ_DEF:
+                    scope.error(
+                        ErrorType.TYPE_ERROR, f"Cannot assign field to non-object"
+                    )
+                var.set_field(operand[1], value, scope.owner)
+            elif opcode == CALL or opcode == TAIL_CALL:
+                base = len(stack) - operand
+                args = stack[base:]
+                this_ref, func = stack[base - 2 : base]
+                del stack[base - 2 :]
+                if opcode == TAIL_CALL and self.__can_tail_call(func, scope):
+                    # Also leaves any block scopes the call is in
+                    frame_scope.exit_scope()
+                    # The called function can still see what a lambda captured
+                    call_scope = parent_scope
+                else:
+                    if len(frames) >= self.max_call_depth:
+                        scope.error(
+                            ErrorType.CALL_DEPTH_ERROR,
+                            f"Call depth exceeded {self.max_call_depth} frames",
+                        )
+                    frames.append(
+                        (
+                            instructions,
+                            pc,
+                            stack,
+                            scope,
+                            frame_scope,
+                            call_scope,
+                            parent_scope,
+                        )
+                    )
+                    call_scope = scope
+                parent_scope, frame_scope = self.__enter(
+                    func, call_scope, args, this_ref
+                )
+                scope = frame_scope
+                instructions = func.code.instructions
+                stack = []
+                pc = 0
+            elif opcode == RETURN:
+                value = stack.pop()
+                if not frames:
+                    return value
+                value = ownership.give_back(value, frame_scope.owner, call_scope.owner)
+                (
+                    instructions,
+                    pc,
+                    stack,
+                    scope,
+                    frame_scope,
+                    call_scope,
+                    parent_scope,
+                ) = frames.pop()
+                # Leaves the scopes of the call, including a lambda's closure
+                # scope and any block scopes a return jumped out of
+                scope.exit_scopes_above()
+                stack.append(value)
+            elif opcode == ARG_VAR:
+                name, index = operand
+                formal_arg = stack[-1 - index].get_args()[index]
+                # If it isn't a variable, the reference is meaningless
+                if formal_arg.is_ref() and scope.is_var(name):
+                    stack.append(scope.get_var_ref(name))
+                else:
+                    stack.append(scope.get_var(name).copy())
+            elif opcode == EXIT_SCOPE:
+                scope.exit_scope()
+                scope = scope.parent_scope
+            elif opcode == LOAD_FIELD:
+                obj = self.__get_object(scope, operand[0])
+                stack.append(obj.get_field(operand[1], operand[2]))
+            elif opcode == RESOLVE_METHOD:
+                objref, name, num_args, cache = operand
+                obj_ref = scope.get_var_ref(objref)
+                obj = obj_ref.get_val()
+                if obj.get_type() != InterpreterBase.OBJ_DEF:
+                    scope.error(
+                        ErrorType.TYPE_ERROR, f"Expected Object, got {obj.get_type()}"
+                    )
+                method = obj.get_method(name, cache)
+                self.__check_num_args(scope, method, num_args)
+                stack.append(obj_ref)
+                stack.append(method)
+            elif opcode == NEW_OBJECT:
+                stack.append(ObjectDef(operand, scope.interpreter, scope.owner))
+            elif opcode == POP:
+                stack.pop()
+            elif opcode == MAKE_LAMBDA:
+                stack.append(CompiledLambda(scope, operand))
+            elif opcode == FORMAT:
+                stack[-1] = scope.format_value(stack[-1])
+            elif opcode == OUTPUT:
+                final_str = "".join(stack[len(stack) - operand :])
+                del stack[len(stack) - operand :]
+                scope.output_string(final_str)
+                stack.append(None)
+            elif opcode == INPUT:
+                stack.append(self.__get_input(scope, *operand, stack))
+            elif opcode == UNARY:
+                stack[-1] = unary_operator.operate(operand, scope, stack[-1])
+            elif opcode == STORE_SLOT:
+                frame_scope.set_slot_var(0, operand[1], stack.pop())
+            else:
+                raise Exception(f"Unknown opcode {opcode}")
+
+    # Makes the scopes of a call to func from call_scope, with its arguments
+    # loaded. Same scoping as FunctionDef.call and LambdaDef.call - a lambda's
+    # captured scope comes first. Returns the parent scope and the new frame
+    def __enter(self, func, call_scope, args, this_ref=None):
+        if func.get_type() == InterpreterBase.LAMBDA_DEF:
+            parent_scope = call_scope.make_closure_scope(func.scope)
+        else:
+            parent_scope = call_scope
+        new_scope = parent_scope.make_child_scope(ownership.Frame())
+        func.load_args(new_scope, args, this_ref)
+        return parent_scope, new_scope
+
+    # Whether a call to func returned right away can run in place of the
+    # function making it, same as FuncCall.evaluate_tail
+    def __can_tail_call(self, func, scope):
+        if func.get_type() != InterpreterBase.FUNC_DEF:
+            return False
+        names = func.template.get_outside_names(scope)
+        return names is not None and not scope.frame_binds_any(names)
+
+    def __check_num_args(self, scope, func, num_args):
+        if len(func.get_args()) != num_args:
+            scope.error(ErrorType.NAME_ERROR, "Incorrect number of arguments")
+
+    def __get_object(self, scope, name):
+        var = scope.get_var(name)
+        if var.get_type() != InterpreterBase.OBJ_DEF:
+            scope.error(ErrorType.TYPE_ERROR, f"{name} is not an object")
+        return var
+
+    def __get_input(self, scope, name, num_args, stack):
+        if num_args > 1:
+            scope.error(
+                ErrorType.NAME_ERROR,
+                f"Expected 0 or 1 arguments, got {num_args}",
+            )
+        elif num_args == 1:
+            scope.output_string(stack.pop())
+        input_val = scope.get_input()
+        if name == INPUTI:
+            if not input_val or not input_val.isnumeric():
+                scope.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Expected integer input, got {input_val}",
+                )
+            return Value(int(input_val))
+        return Value(input_val)
@@ -0,0 +1,18 @@
+class CallCache:
+    """Inline cache for one function call site.
+
+    Remembers which entry of the function tables the call's name and number
+    of arguments resolved to, or that there is none and the function is
+    looked up in the variables instead. Function tables only change when a
+    function is defined, which changes the interpreter's func_epoch, so the
+    entry is only used in the epoch it was found in.
+    """
+
+    __slots__ = ("epoch", "func_ref")
+
+    def __init__(self):
+        self.epoch = None
+        self.func_ref = None
+
+    def __repr__(self):
+        return "CallCache"
@@ -6,40 +6,68 @@ from intbase import ErrorType
 
 
 class Conditional:
-    def __init__(self, scope, element, is_while, trace_output=False):
-        self.scope = scope.make_child_scope()
-        self.trace_output = trace_output
+    __slots__ = (
+        "is_while",
+        "condition",
+        "statements",
+        "has_else",
+        "else_statements",
+    )
+
+    def __init__(self, element, is_while, addresses=None):
         self.is_while = is_while
-        self.__load_element(element)
+        self.__load_element(element, addresses)
 
-    def __load_element(self, element):
-        self.condition = element.get(CONDITION)
-        self.statements = element.get(STATEMENTS)
-        self.else_statements = element.get(ELSE_STATEMENTS)
-        self.has_else = self.else_statements != None
+    def __load_element(self, element, addresses):
+        self.condition = convert_element.convert_element(
+            element.get(CONDITION), addresses
+        )
+        self.statements = [
+            convert_element.convert_element(statement, addresses)
+            for statement in element.get(STATEMENTS)
+        ]
+        self.has_else = element.get(ELSE_STATEMENTS) != None
+        if self.has_else:
+            self.else_statements = [
+                convert_element.convert_element(statement, addresses)
+                for statement in element.get(ELSE_STATEMENTS)
+            ]
 
-    def evaluate(self):
-        if self.trace_output:
+    def evaluate(self, scope):
+        if scope.interpreter.trace_output:
             print(f"Evaluating {str(self)}")
-        condition_met = convert_element.convert_element(
-            self.condition, self.scope
-        ).evaluate()
+        # Each execution of the statement gets its own block scope
+        scope = scope.make_child_scope()
+        returned_val = self.__run(scope)
+        scope.exit_scope()
+        return returned_val
+
+    def __run(self, scope):
+        if not self.is_while:
+            if self.__check_condition(scope):
+                return eval_mult_statements(self.statements, scope)
+            elif self.has_else:
+                return eval_mult_statements(self.else_statements, scope)
+            return
+        # Loops run iteratively in the same block scope, so the Python stack
+        # doesn't grow with the number of iterations
+        while self.__check_condition(scope):
+            returned_val = eval_mult_statements(self.statements, scope)
+            if type(returned_val) == return_type.ReturnValue:
+                return returned_val
+
+    def __check_condition(self, scope):
+        condition_met = self.condition.evaluate(scope)
         if (
             condition_met.get_type() != InterpreterBase.BOOL_DEF
             and condition_met.get_type() != InterpreterBase.INT_DEF
         ):
-            self.scope.error(
+            scope.error(
                 ErrorType.TYPE_ERROR,
                 f"Expected boolean or int, got {condition_met.get_type()}",
             )
-        if condition_met.get_val():
-            returned_val = eval_mult_statements(self.statements, self.scope)
-            if type(returned_val) == return_type.Return:
-                return returned_val
-            # If we are a while loop we evaluate again
-            if self.is_while:
-                return self.evaluate()
-        elif self.has_else:
-            returned_val = eval_mult_statements(self.else_statements, self.scope)
-            if type(returned_val) == return_type.Return:
-                return returned_val
+        return condition_met.get_val()
+
+    def __str__(self):
+        kind = InterpreterBase.WHILE_DEF if self.is_while else InterpreterBase.IF_DEF
+        return f"Conditional({kind}, {str(self.condition)})"
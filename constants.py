@@ -76,3 +76,6 @@ VALUE_TYPES = [
 ]
 
 ARG_TYPES = [InterpreterBase.ARG_DEF, InterpreterBase.REFARG_DEF]
+
+# The most frames the bytecode VM lets a program have on its stack at once
+MAX_CALL_DEPTH = 200000
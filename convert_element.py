@@ -5,18 +5,19 @@ import value
 import binary_operator
 import unary_operator
 import function_def
-import lambda_def
 import assignment
 import conditional
 import return_type
 import arg
 import func_call
 import variable
-import object_def
+import object_literal
+import lambda_expression
 import mcall
 
 
-def convert_element(element, scope=None):
+# addresses is what resolve_function found in the function element is part of
+def convert_element(element, addresses=None):
     if type(element) != Element:
         raise Exception(f"Expected Element, got {type(element)}")
     elem_type = element.elem_type
@@ -25,27 +26,27 @@ def convert_element(element, scope=None):
     if elem_type == InterpreterBase.FUNC_DEF:
         return function_def.FunctionDef(element)
     if elem_type in BINARY_OPERATORS:
-        return binary_operator.BinaryOperator(scope, element)
+        return binary_operator.BinaryOperator(element, addresses)
     if elem_type in UNARY_OPERATORS:
-        return unary_operator.UnaryOperator(scope, element)
+        return unary_operator.UnaryOperator(element, addresses)
     if elem_type in ARG_TYPES:
         return arg.Arg(element)
     if elem_type == InterpreterBase.LAMBDA_DEF:
-        return lambda_def.LambdaDef(scope, element)
+        return lambda_expression.LambdaExpression(element)
     if elem_type == ASSIGNMENT:
-        return assignment.Assignment(scope, element)
+        return assignment.Assignment(element, addresses)
     if elem_type in CONDITIONALS:
         return conditional.Conditional(
-            scope, element, elem_type == InterpreterBase.WHILE_DEF
+            element, elem_type == InterpreterBase.WHILE_DEF, addresses
         )
     if elem_type == InterpreterBase.RETURN_DEF:
-        return return_type.Return(scope, element)
+        return return_type.Return(element, addresses)
     if elem_type == InterpreterBase.VAR_DEF:
-        return variable.Variable(scope, element)
+        return variable.Variable(element, addresses)
     if elem_type == InterpreterBase.FCALL_DEF:
-        return func_call.FuncCall(scope, element)
+        return func_call.FuncCall(element, addresses)
     if elem_type == InterpreterBase.OBJ_DEF:
-        return object_def.ObjectDef(element)
+        return object_literal.ObjectLiteral(element)
     if elem_type == InterpreterBase.MCALL_DEF:
-        return mcall.MCall(scope, element)
+        return mcall.MCall(element, addresses)
     raise Exception(f"Unknown element type {elem_type}")
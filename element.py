@@ -1,9 +1,9 @@
 class Element:
+    __slots__ = ("elem_type", "dict")
+
     def __init__(self, elem_type, **kwargs):
         self.elem_type = elem_type
-        self.dict = {}
-        for key, value in kwargs.items():
-            self.dict[key] = value
+        self.dict = kwargs
 
     def get(self, key):
         if key not in self.dict:
@@ -0,0 +1,53 @@
+from constants import PROTO
+
+
+class FieldCache:
+    """Inline cache for one field read or method call site.
+
+    Remembers where the field was found for the last receiver: its shape, and
+    for a field found on a prototype, the receiver's prototype and the object
+    holding the field. A receiver with the same shape finds an own field in
+    the same slot. A field on a prototype is only still there while no
+    prototype chain has changed since (see the interpreter's proto_epoch) and
+    the receiver has the same prototype.
+    """
+
+    __slots__ = ("shape", "slot", "holder", "proto", "proto_slot", "epoch")
+
+    def __init__(self):
+        self.shape = None
+        self.slot = None
+        self.holder = None
+        self.proto = None
+        self.proto_slot = None
+        self.epoch = None
+
+    # The cached field of obj, or None if it has to be looked up
+    def lookup(self, obj):
+        if obj.shape is not self.shape:
+            return None
+        if self.holder is None:
+            return obj.slots[self.slot]
+        if (
+            self.epoch == obj.interpreter.proto_epoch
+            and obj.has_prototype
+            and obj.slots[self.proto_slot] is self.proto
+        ):
+            return self.holder.slots[self.slot]
+        return None
+
+    # Records that the field of obj was found in slot of holder
+    def remember(self, obj, holder, slot):
+        self.shape = obj.shape
+        self.slot = slot
+        if holder is obj:
+            self.holder = None
+            self.proto = None
+            return
+        self.holder = holder
+        self.proto_slot = obj.shape.get_slot(PROTO)
+        self.proto = obj.slots[self.proto_slot]
+        self.epoch = obj.interpreter.proto_epoch
+
+    def __repr__(self):
+        return "FieldCache"
@@ -3,43 +3,43 @@ from intbase import InterpreterBase
 from intbase import ErrorType
 from constants import *
 import convert_element
-import scope
 from value import Value
+from call_cache import CallCache
+import return_type
 
 
 class FuncCall:
-    def __init__(self, scope, element, trace_output=False):
-        self.scope = scope
-        self.trace_output = trace_output
-        self.__load_element(element)
-
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    __slots__ = ("name", "args", "call_cache")
+
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element or element.elem_type != InterpreterBase.FCALL_DEF:
             raise Exception(f"Expected Element, got {type(element)}")
         self.name = element.get(NAME)
         self.args = []
         for arg in element.get(ARGS):
-            self.args.append(convert_element.convert_element(arg, self.scope))
+            self.args.append(convert_element.convert_element(arg, addresses))
+        self.call_cache = CallCache()
 
-    def run_preloaded(self):
+    def run_preloaded(self, scope):
         num_args = len(self.args)
         if self.name == PRINT:
-            self.scope.output(self.args)
+            scope.output(self.args)
         elif self.name in INPUT_TAKERS:
             if num_args > 1:
-                self.scope.error(
+                scope.error(
                     ErrorType.NAME_ERROR,
                     f"Expected 0 or 1 arguments, got {num_args}",
                 )
                 return
             elif num_args == 1:
-                self.scope.output(self.args)
-            input_val = self.scope.get_input()
+                scope.output(self.args)
+            input_val = scope.get_input()
             if self.name == INPUTI:
                 if not input_val or not input_val.isnumeric():
-                    self.scope.error(
+                    scope.error(
                         ErrorType.TYPE_ERROR,
                         f"Expected integer input, got {input_val}",
                     )
@@ -47,15 +47,29 @@ class FuncCall:
             else:
                 return Value(input_val)
 
-    def evaluate(self):
-        if self.trace_output:
+    def evaluate(self, scope):
+        if scope.interpreter.trace_output:
             print(f"Evaluating {str(self)}")
         num_args = len(self.args)
         if self.name in PRELOADED_FUNCS:
-            return self.run_preloaded()
-        return self.scope.get_func(self.name, num_args).invoke_func(
-            self.scope, self.args
-        )
+            return self.run_preloaded(scope)
+        func = scope.get_func(self.name, num_args, self.call_cache)
+        return func.invoke_func(scope, self.args)
+
+    # Evaluates the call as the last thing the calling function does. The
+    # calling function's scopes can go before a named function is called if
+    # it can't look up anything in them, then this only evaluates the
+    # arguments and gives back the TailCall to make
+    def evaluate_tail(self, scope):
+        if scope.interpreter.trace_output:
+            print(f"Evaluating tail call {str(self)}")
+        func = scope.get_func(self.name, len(self.args), self.call_cache)
+        if func.get_type() == InterpreterBase.FUNC_DEF:
+            names = func.template.get_outside_names(scope)
+            if names is not None and not scope.frame_binds_any(names):
+                arg_values = func.evaluate_args(scope, self.args)
+                return return_type.TailCall(func, arg_values)
+        return func.invoke_func(scope, self.args)
 
     def __str__(self):
         return f"FuncCall({self.name}, {[str(arg) for arg in self.args]})"
@@ -1,78 +1,101 @@
 from constants import *
-import convert_element
 from intbase import InterpreterBase
 from intbase import ErrorType
-from element import Element
 import return_type
 from eval_mult_statements import eval_mult_statements
-from copy import deepcopy
+from function_template import FunctionTemplate
+from value_wrapper import ValueWrapper
+from copy import copy
+import ownership
 
 
 class FunctionDef:
-    def __init__(self, element, trace_output=False):
-        self.trace_output = trace_output
-        self.__load_element(element)
+    __slots__ = ("template",)
 
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
-        if type(element) != Element:
-            raise Exception(f"Expected Element, got {type(element)}")
-        if (
-            element.elem_type != InterpreterBase.FUNC_DEF
-            and element.elem_type != InterpreterBase.LAMBDA_DEF
-        ):
-            raise Exception(f"Expected function definition, got {element.elem_type}")
-        self.statements = element.get(STATEMENTS)
-        self.statements.append(Element(InterpreterBase.RETURN_DEF))
-        # print(f"Statements: {[str(statement) for statement in self.statements]}")
-        old_args = element.get(ARGS)
-        self.args = []
-        for arg in old_args:
-            self.args.append(convert_element.convert_element(arg, None))
+    def __init__(self, element):
+        self.template = FunctionTemplate(element)
 
-    def load_args(self, scope, args):
-        if len(args) != len(self.args):
+    # Evaluates the arguments in the caller's scope, giving what each formal
+    # argument gets bound to (a ValueWrapper for references)
+    def evaluate_args(self, scope, args):
+        formal_args = self.template.args
+        if len(args) != len(formal_args):
             scope.error(ErrorType.NAME_ERROR, "Incorrect number of arguments")
+        arg_values = []
         for i in range(len(args)):
-            arg = self.args[i]
-            if arg.is_ref():
-                # If it isn't a variable, the reference is meaningless
-                if args[i].get_type() == InterpreterBase.VAR_DEF and scope.is_var(
-                    args[i].get_name()
-                ):
-                    scope.add_ref_var(arg.get_name(), args[i].get_ref())
-                # We don't need to load functions again
-                else:
-                    scope.add_new_var(arg.get_name(), args[i].evaluate().copy())
+            # If it isn't a variable, the reference is meaningless
+            if (
+                formal_args[i].is_ref()
+                and args[i].get_type() == InterpreterBase.VAR_DEF
+                and scope.is_var(args[i].get_name())
+            ):
+                arg_values.append(args[i].get_ref(scope))
             else:
-                scope.add_new_var(arg.get_name(), args[i].evaluate().copy())
+                arg_values.append(args[i].evaluate(scope).copy())
+        return arg_values
 
-    def invoke_func(self, scope, args):
-        new_scope = scope.make_child_scope()
-        self.load_args(new_scope, args)
-        return_val = eval_mult_statements(self.statements, new_scope)
-        if type(return_val) == return_type.Return:
-            return return_val.get_val()
-        raise Exception("No return statement found")
+    # Arguments are stored in slots, in the order resolve_function numbered them.
+    # Anything not passed by reference is a copy only the new scope refers to.
+    # Methods also get this_ref bound in the new scope, under their arguments
+    def load_args(self, new_scope, arg_values, this_ref=None):
+        if this_ref is not None and self.binds_this():
+            new_scope.add_ref_var(InterpreterBase.THIS_DEF, this_ref)
+        value_refs = []
+        for arg_value in arg_values:
+            if type(arg_value) != ValueWrapper:
+                ownership.adopt(arg_value, new_scope.owner)
+                arg_value = ValueWrapper(arg_value, new_scope.owner)
+            value_refs.append(arg_value)
+        new_scope.add_slot_vars(self.template.arg_names, value_refs)
+
+    # Arguments are evaluated before the new function scope is entered, so the
+    # caller's scope is still the innermost one while they run
+    def invoke_func(self, scope, args, this_ref=None):
+        arg_values = self.evaluate_args(scope, args)
+        return self.call(scope, arg_values, this_ref)
+
+    # Runs the body with the already evaluated arguments, in a new scope that
+    # hangs off of call_scope. this_ref is the object a method is called on.
+    # A function ending in a tail call (see FuncCall.evaluate_tail) is done,
+    # the function it calls runs in its place
+    def call(self, call_scope, arg_values, this_ref=None):
+        func = self
+        while True:
+            new_scope = call_scope.make_child_scope(ownership.Frame())
+            func.load_args(new_scope, arg_values, this_ref)
+            return_val = eval_mult_statements(func.template.statements, new_scope)
+            new_scope.exit_scope()
+            if type(return_val) != return_type.ReturnValue:
+                raise Exception("No return statement found")
+            tail_call = return_val.value
+            if type(tail_call) != return_type.TailCall:
+                return return_val.get_val(new_scope.owner, call_scope.owner)
+            func = tail_call.func
+            arg_values = tail_call.arg_values
+            this_ref = None
+
+    def binds_this(self):
+        return True
 
     def get_statements(self):
-        return self.statements
+        return self.template.statements
 
     def get_args(self):
-        return self.args
+        return self.template.args
 
     def get_num_args(self):
-        return len(self.args)
+        return len(self.template.args)
 
     def get_type(self):
         return InterpreterBase.FUNC_DEF
 
-    def evaluate(self):
+    def evaluate(self, scope=None):
         return self
 
+    # Functions are never modified, copies only need their own identity and
+    # share the template
     def copy(self):
-        return deepcopy(self)
+        return copy(self)
 
     def __str__(self):
-        return f"FunctionDef - Args: {[str(arg) for arg in self.args]} - Statements: {[str(statement) for statement in self.statements]}"
+        return f"FunctionDef - {str(self.template)}"
@@ -0,0 +1,84 @@
+from constants import *
+import convert_element
+from intbase import InterpreterBase
+from element import Element
+from resolver import resolve_function, find_free_names
+
+
+class FunctionTemplate:
+    """What every instance of one func or lambda definition shares.
+
+    The body is resolved and lowered once, when the definition is loaded, and
+    is never modified afterwards. Loading only reads the definition's Element,
+    so templates can be built from a cached or shared parse tree. A named
+    function is a single instance of its template, while each evaluation of a
+    lambda expression only pairs the lambda's template with the variables it
+    captures.
+    """
+
+    def __init__(self, element):
+        self.__load_element(element)
+        self.outside_names = None
+        self.outside_names_found = False
+
+    def __load_element(self, element):
+        if type(element) != Element:
+            raise Exception(f"Expected Element, got {type(element)}")
+        if (
+            element.elem_type != InterpreterBase.FUNC_DEF
+            and element.elem_type != InterpreterBase.LAMBDA_DEF
+        ):
+            raise Exception(f"Expected function definition, got {element.elem_type}")
+        self.name = element.get(NAME)
+        addresses = resolve_function(element)
+        self.free_names, self.calls = find_free_names(element)
+        self.statements = []
+        for statement in element.get(STATEMENTS):
+            self.statements.append(
+                convert_element.convert_element(statement, addresses)
+            )
+        # Falling off the end of the body returns nil
+        self.statements.append(
+            convert_element.convert_element(Element(InterpreterBase.RETURN_DEF))
+        )
+        self.args = []
+        for arg in element.get(ARGS):
+            self.args.append(convert_element.convert_element(arg))
+        self.arg_names = [arg.get_name() for arg in self.args]
+
+    # Every variable name the body, or any function it calls, can look up in
+    # the scopes it's called from. None if it calls something that can't be
+    # known before it runs. Calls are resolved from scope, the same functions
+    # are found from anywhere in the program
+    def get_outside_names(self, scope):
+        if not self.outside_names_found:
+            self.outside_names = self.__find_outside_names(scope)
+            self.outside_names_found = True
+        return self.outside_names
+
+    def __find_outside_names(self, scope):
+        names = set()
+        seen = {id(self)}
+        pending = [self]
+        while pending:
+            template = pending.pop()
+            if template.calls is None:
+                return None
+            names.update(template.free_names)
+            for name, num_args in template.calls:
+                func_scope = scope.get_func_scope(name, num_args)
+                if func_scope is None:
+                    # A variable holding a function or lambda
+                    return None
+                callee = func_scope.get_func(name, num_args).template
+                if id(callee) not in seen:
+                    seen.add(id(callee))
+                    pending.append(callee)
+        return names
+
+    # Templates are never modified, so copies of functions and lambdas share them
+    def __deepcopy__(self, memo):
+        return self
+
+    def __str__(self):
+        return f"FunctionTemplate - Args: {[str(arg) for arg in self.args]} - Statements: {[str(statement) for statement in self.statements]}"
@@ -6,6 +6,7 @@ class ErrorType(Enum):
     TYPE_ERROR = 1
     NAME_ERROR = 2  # if a variable or function name can't be found
     FAULT_ERROR = 3  # used if an object reference is null and used to make a call
+    CALL_DEPTH_ERROR = 4  # if calls nest deeper than the interpreter allows
     # Add others here
 
 
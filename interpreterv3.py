@@ -1,5 +1,5 @@
 from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from brewpratt import parse_program
 from scope import Scope
 from convert_element import convert_element
 from constants import *
@@ -9,6 +9,16 @@ class Interpreter(InterpreterBase):
     def __init__(self, console_output=True, inp=None, trace_output=False):
         super().__init__(console_output, inp)
         self.trace_output = trace_output
+        # Changes whenever a function is defined, call sites only use the
+        # function they cached in the epoch they found it in (see CallCache)
+        self.func_epoch = 0
+        # Counts what binary operators do while set to a QuickeningStats
+        self.quickening_stats = None
+
+    # Everything a run makes refers back to its interpreter, copying values
+    # must never copy the interpreter itself
+    def __deepcopy__(self, memo):
+        return self
 
     def error(self, error_type: ErrorType, message: str) -> None:
         super().error(error_type, message)
@@ -30,9 +40,11 @@ class Interpreter(InterpreterBase):
         if root_node.elem_type != InterpreterBase.PROGRAM_DEF:
             raise Exception(f"Expected program node, received {root_node.elem_type}")
         base_scope = Scope(None, self)
+        base_scope.track_bindings()
         for function in root_node.get(FUNCTIONS):
             base_scope.add_new_func(convert_element(function), function.get(NAME))
+        # Everything is lowered up front, the scope is only supplied at evaluation
         func_call = convert_element(
-            Element(InterpreterBase.FCALL_DEF, name="main", args=[]), base_scope
+            Element(InterpreterBase.FCALL_DEF, name="main", args=[])
         )
-        func_call.evaluate()
+        func_call.evaluate(base_scope)
@@ -1,14 +1,54 @@
 from intbase import InterpreterBase, ErrorType
-from brewparse import parse_program
+from brewpratt import parse_program
 from scope import Scope
 from convert_element import convert_element
 from constants import *
 
 
 class Interpreter(InterpreterBase):
-    def __init__(self, console_output=True, inp=None, trace_output=False):
+    # use_bytecode runs programs on the bytecode VM instead of the tree-walker.
+    # The VM keeps Brewin calls on a stack of its own rather than Python's, so
+    # recursion isn't bounded by Python's recursion limit. max_call_depth is
+    # the most calls the VM lets be in progress at once instead. At the
+    # default, MAX_CALL_DEPTH, the frames of a simple recursive function take
+    # about 200 MB. The tree-walker ignores it, its calls recurse in Python and
+    # are limited by Python's recursion limit. Either engine reports going
+    # past its limit as a CALL_DEPTH_ERROR.
+    # cache_dir keeps parsed programs there to skip parsing them again
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        use_bytecode=False,
+        cache_dir=None,
+        max_call_depth=MAX_CALL_DEPTH,
+    ):
         super().__init__(console_output, inp)
         self.trace_output = trace_output
+        # Changes whenever a function is defined, call sites only use the
+        # function they cached in the epoch they found it in (see CallCache)
+        self.func_epoch = 0
+        # Counts what binary operators do while set to a QuickeningStats
+        self.quickening_stats = None
+        # Changes whenever a prototype chain might have changed - a proto is
+        # assigned, or a field is added to an object some object has as its
+        # prototype. Field caches holding fields found on prototypes are only
+        # valid in the epoch they were filled in
+        self.proto_epoch = 0
+        self.use_bytecode = use_bytecode
+        self.max_call_depth = max_call_depth
+        self.ast_cache = None
+        if cache_dir is not None:
+            # Optional features are imported on use to keep startup fast
+            from ast_cache import ASTCache
+
+            self.ast_cache = ASTCache(cache_dir)
+
+    # Everything a run makes refers back to its interpreter, copying values
+    # must never copy the interpreter itself
+    def __deepcopy__(self, memo):
+        return self
 
     def error(self, error_type: ErrorType, message: str) -> None:
         super().error(error_type, message)
@@ -24,15 +64,31 @@ class Interpreter(InterpreterBase):
         return super().get_input()
 
     def run(self, program: str) -> None:
-        ast = parse_program(program)
+        if self.ast_cache is not None:
+            ast = self.ast_cache.parse(program)
+        else:
+            ast = parse_program(program)
         root_node = ast
         # The root_node should be a program node
         if root_node.elem_type != InterpreterBase.PROGRAM_DEF:
             raise Exception(f"Expected program node, received {root_node.elem_type}")
         base_scope = Scope(None, self)
+        base_scope.track_bindings()
+        if self.use_bytecode:
+            from bytecode_vm import BytecodeVM
+
+            BytecodeVM(self.max_call_depth).run(root_node, base_scope)
+            return
         for function in root_node.get(FUNCTIONS):
             base_scope.add_new_func(convert_element(function), function.get(NAME))
+        # Everything is lowered up front, the scope is only supplied at evaluation
         func_call = convert_element(
-            Element(InterpreterBase.FCALL_DEF, name="main", args=[]), base_scope
+            Element(InterpreterBase.FCALL_DEF, name="main", args=[])
         )
-        func_call.evaluate()
+        try:
+            func_call.evaluate(base_scope)
+        except RecursionError:
+            self.error(
+                ErrorType.CALL_DEPTH_ERROR,
+                "Call depth exceeded Python's recursion limit",
+            )
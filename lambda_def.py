@@ -1,23 +1,41 @@
 from function_def import FunctionDef
 from intbase import InterpreterBase
+from copy import deepcopy
+import ownership
 
 
 class LambdaDef(FunctionDef):
-    def __init__(self, scope, element, trace_output=False):
-        super().__init__(element, trace_output)
-        # print(f"Making lambda with scope: {str(scope)}")
-        self.scope = scope.copy()
+    # A lambda is its expression's template and the variables it captures
+    # from the scope it's made in
+    __slots__ = ("owner", "shared", "scope")
+
+    def __init__(self, scope, template):
+        self.template = template
+        self.owner = scope.owner
+        self.shared = False
+        self.scope = scope.capture(template.get_outside_names(scope), self)
 
     def get_scope(self):
         return self.scope
 
-    def invoke_func(self, scope, args):
-        # The scope the lambda is invoked in is at the very outside - make a shallow copy to avoid cyclical scoping
-        base_scope = self.scope.get_base_scope()
-        self.scope.add_base_scope(scope.shallow_copy())
-        returned_val = super().invoke_func(self.scope, args)
-        base_scope.parent_scope = None
+    # The captured variables come first, then the ones of the scope the
+    # lambda is invoked in
+    def call(self, call_scope, arg_values, this_ref=None):
+        closure_scope = call_scope.make_closure_scope(self.scope)
+        returned_val = super().call(closure_scope, arg_values, this_ref)
+        closure_scope.exit_scope()
         return returned_val
 
+    # A captured this comes before the object the lambda is called on
+    def binds_this(self):
+        return not self.scope.is_var(InterpreterBase.THIS_DEF)
+
     def get_type(self):
         return InterpreterBase.LAMBDA_DEF
+
+    # Unlike functions, closures can change the variables they captured
+    def copy(self):
+        return deepcopy(self)
+
+    def __deepcopy__(self, memo):
+        return ownership.copy_owned(self, memo)
@@ -0,0 +1,27 @@
+from intbase import InterpreterBase
+from element import Element
+import lambda_def
+from function_template import FunctionTemplate
+
+
+class LambdaExpression:
+    __slots__ = "template"
+
+    def __init__(self, element):
+        self.__load_element(element)
+
+    def __load_element(self, element):
+        if type(element) != Element or element.elem_type != InterpreterBase.LAMBDA_DEF:
+            raise Exception(f"Expected Lambda Element, got {type(element)}")
+        # Compiled once, every lambda made by this expression shares it
+        self.template = FunctionTemplate(element)
+
+    def get_type(self):
+        return InterpreterBase.LAMBDA_DEF
+
+    def evaluate(self, scope):
+        # The closure captures the scope it is evaluated in, not the one it was compiled in
+        return lambda_def.LambdaDef(scope, self.template)
+
+    def __str__(self):
+        return f"LambdaExpression({str(self.template)})"
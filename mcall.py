@@ -1,35 +1,34 @@
 from intbase import InterpreterBase, ErrorType
 from constants import *
 from element import Element
-import scope
 import convert_element
+from field_cache import FieldCache
 
 
 class MCall:
-    def __init__(self, scope, element, trace_output=False):
-        self.trace_output = trace_output
-        self.scope = scope
-        self.__load_element(element)
+    __slots__ = ("objref", "name", "args", "method_cache")
 
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element or element.elem_type != InterpreterBase.MCALL_DEF:
             raise Exception(f"Expected Element, got {type(element)}")
         self.objref = element.get(OBJREF)
         self.name = element.get(NAME)
         self.args = []
         for arg in element.get(ARGS):
-            self.args.append(convert_element.convert_element(arg, self.scope))
+            self.args.append(convert_element.convert_element(arg, addresses))
+        self.method_cache = FieldCache()
 
-    def evaluate(self):
-        obj = self.scope.get_var(self.objref)
-        obj_ref = self.scope.get_var_ref(self.objref)
+    def evaluate(self, scope):
+        obj_ref = scope.get_var_ref(self.objref)
+        obj = obj_ref.get_val()
         if obj.get_type() != InterpreterBase.OBJ_DEF:
-            self.scope.error(
-                ErrorType.TYPE_ERROR, f"Expected Object, got {obj.get_type()}"
-            )
-        # Adding this to the scope
-        this_scope = scope.Scope(self.scope, trace_output=self.trace_output)
-        this_scope.add_ref_var(InterpreterBase.THIS_DEF, obj_ref)
-        return obj.invoke_method(this_scope, self.name, self.args)
+            scope.error(ErrorType.TYPE_ERROR, f"Expected Object, got {obj.get_type()}")
+        return obj.invoke_method(
+            scope, obj_ref, self.name, self.args, self.method_cache
+        )
+
+    def __str__(self):
+        return f"MCall({self.objref}.{self.name}, {[str(arg) for arg in self.args]})"
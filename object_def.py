@@ -2,75 +2,125 @@ from intbase import InterpreterBase, ErrorType
 from constants import *
 from copy import deepcopy
 from element import Element
-import scope
+from shape import EMPTY_SHAPE
+import ownership
 
 
 class ObjectDef:
-    def __init__(self, element, trace_output=False):
-        self.trace_output = trace_output
+    __slots__ = (
+        "interpreter",
+        "shape",
+        "slots",
+        "has_prototype",
+        "is_prototype",
+        "owner",
+        "shared",
+    )
+
+    # owner is the frame that created the object
+    def __init__(self, element, interpreter, owner):
         self.__load_element(element)
-        self.scope = scope.Scope(None, trace_output=self.trace_output)
+        self.interpreter = interpreter
+        # Field values are kept in slots, in the order the shape gives them
+        self.shape = EMPTY_SHAPE
+        self.slots = []
         self.has_prototype = False
+        # Whether the object was ever assigned as a prototype
+        self.is_prototype = False
+        self.owner = owner
+        self.shared = False
 
     def __load_element(self, element):
         if type(element) != Element or element.elem_type != InterpreterBase.OBJ_DEF:
             raise Exception(f"Expected Object Element, got {type(element)}")
 
-    def get_field(self, field_name):
-        return self.get_field_ref(field_name).get_val()
+    # Fields the object doesn't have are looked up along its prototype chain.
+    # cache is the FieldCache of the site reading the field, if it has one
+    def get_field(self, field_name, cache=None):
+        if cache is not None:
+            value = cache.lookup(self)
+            if value is not None:
+                return value
+        holder, slot = self.__find_field(field_name)
+        if cache is not None:
+            cache.remember(self, holder, slot)
+        return holder.slots[slot]
+
+    # The object on the prototype chain holding field_name, and its slot
+    def __find_field(self, field_name):
+        obj = self
+        while True:
+            slot = obj.shape.get_slot(field_name)
+            if slot is not None:
+                return obj, slot
+            if not obj.has_prototype:
+                self.interpreter.error(
+                    ErrorType.NAME_ERROR, f"Field {field_name} not defined"
+                )
+            obj = obj.slots[obj.shape.get_slot(PROTO)]
 
     def get_prototype(self):
         if not self.has_prototype:
             return None
-        return self.get_field(PROTO)
-
-    def get_field_ref(self, field_name):
-        if self.has_field(field_name):
-            if self.scope.is_var(field_name):
-                return self.scope.get_var_ref(field_name)
-            return self.get_prototype().get_field_ref(field_name)
-        self.scope.error(ErrorType.NAME_ERROR, f"Field {field_name} not defined")
+        return self.slots[self.shape.get_slot(PROTO)]
 
-    def set_field(self, field_name, value):
+    # frame is the one of the code doing the assignment
+    def set_field(self, field_name, value, frame):
         if field_name == PROTO:
-            if self.trace_output:
+            self.interpreter.proto_epoch += 1
+            if self.interpreter.trace_output:
                 print(f"Setting prototype of {str(self)} to {str(value)}")
             if value.get_type() == InterpreterBase.NIL_DEF:
                 self.has_prototype = False
                 return
             if value.get_type() != InterpreterBase.OBJ_DEF:
-                self.scope.error(
+                self.interpreter.error(
                     ErrorType.TYPE_ERROR, "Cannot assign prototype to non-object"
                 )
             self.has_prototype = True
-        self.scope.set_var(field_name, value)
+            value.is_prototype = True
+        slot = self.shape.get_slot(field_name)
+        if slot is None:
+            if self.is_prototype:
+                self.interpreter.proto_epoch += 1
+            self.shape = self.shape.add_field(field_name)
+            self.slots.append(value)
+        else:
+            self.slots[slot] = value
+        ownership.store(value, self, frame)
 
-    def has_field(self, var_name):
-        if self.scope.is_var(var_name):
-            return True
-        if self.has_prototype:
-            return self.get_prototype().has_field(var_name)
-        return False
+    def has_field(self, field_name):
+        obj = self
+        while obj.shape.get_slot(field_name) is None:
+            if not obj.has_prototype:
+                return False
+            obj = obj.get_prototype()
+        return True
 
-    def invoke_method(self, invoke_scope, method_name, args):
-        if self.trace_output:
-            print(f"Invoking method {method_name} on {str(self)}")
-        method = self.get_field(method_name)
+    def get_method(self, method_name, cache=None):
+        method = self.get_field(method_name, cache)
         if (
             method.get_type() != InterpreterBase.FUNC_DEF
             and method.get_type() != InterpreterBase.LAMBDA_DEF
         ):
-            self.scope.error(
+            self.interpreter.error(
                 ErrorType.TYPE_ERROR, f"Expected function, got {method.get_type()}"
             )
-            return
-        return method.invoke_func(invoke_scope, args)
+        return method
+
+    def invoke_method(self, scope, this_ref, method_name, args, cache=None):
+        if self.interpreter.trace_output:
+            print(f"Invoking method {method_name} on {str(self)}")
+        return self.get_method(method_name, cache).invoke_func(scope, args, this_ref)
 
     def get_type(self):
         return InterpreterBase.OBJ_DEF
 
-    def evaluate(self):
+    def evaluate(self, scope=None):
         return self
 
     def copy(self):
         return deepcopy(self)
+
+    def __deepcopy__(self, memo):
+        return ownership.copy_owned(self, memo)
@@ -0,0 +1,25 @@
+from intbase import InterpreterBase
+from element import Element
+import object_def
+
+
+class ObjectLiteral:
+    __slots__ = "element"
+
+    def __init__(self, element):
+        self.__load_element(element)
+
+    def __load_element(self, element):
+        if type(element) != Element or element.elem_type != InterpreterBase.OBJ_DEF:
+            raise Exception(f"Expected Object Element, got {type(element)}")
+        self.element = element
+
+    def get_type(self):
+        return InterpreterBase.OBJ_DEF
+
+    def evaluate(self, scope):
+        # Every evaluation of @ makes a brand new object
+        return object_def.ObjectDef(self.element, scope.interpreter, scope.owner)
+
+    def __str__(self):
+        return "ObjectLiteral()"
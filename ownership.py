@@ -0,0 +1,114 @@
+from copy import deepcopy
+from intbase import InterpreterBase
+from value import Value
+
+# Returning an object or closure from a function gives the caller a copy of
+# it, but the copy is only observable if something still refers to the
+# original. Objects and closures track an owner for this - the frame whose
+# variables refer to them, or the one object or closure holding them - and
+# whether they are shared, i.e. might also be referred to from anywhere else.
+# A function returning something it owns that isn't shared hands it over
+# without copying. Sharing is sticky and spreads to the owners above, so an
+# unshared value never contains anything referred to from outside of it
+
+
+class Frame:
+    """Owner of the values only referred to by one invocation's variables"""
+
+    __slots__ = ()
+
+    # Copies of objects and closures keep the same frame
+    def __deepcopy__(self, memo):
+        return self
+
+
+def is_owned(value):
+    return type(value) is not Value and value.get_type() != InterpreterBase.FUNC_DEF
+
+
+def is_container(holder):
+    return holder is not None and type(holder) is not Frame
+
+
+# Marks value and everything holding it as shared
+def share(value):
+    while is_container(value) and not value.shared:
+        value.shared = True
+        value = value.owner
+
+
+# Records a reference to value being stored in a variable or field of holder
+# (a Frame, object, closure or None if unknown) by code running in frame.
+# Something the running frame owns can move into a single object or closure,
+# the frame's own variables go away when it returns
+def store(value, holder, frame):
+    if not is_owned(value) or value.owner is holder:
+        return
+    if value.owner is frame and not value.shared and is_container(holder):
+        value.owner = holder
+        return
+    share(value)
+    if is_container(holder):
+        share(holder)
+
+
+# A closure capturing value_ref shares it with the scope it came from
+def capture(value_ref, closure):
+    value_ref.owner = None
+    value = value_ref.get_val()
+    if is_owned(value):
+        share(value)
+        share(closure)
+
+
+# value was just copied and only frame refers to the copy
+def adopt(value, frame):
+    if is_owned(value):
+        value.owner = frame
+
+
+# What a call returning value from frame gives the caller, without copying
+# anything the frame owns outright
+def give_back(value, frame, caller_frame):
+    if is_owned(value) and value.owner is frame and not value.shared:
+        value.owner = caller_frame
+        return value
+    value = value.copy()
+    adopt(value, caller_frame)
+    return value
+
+
+# Deep copy of an object or closure, for their __deepcopy__. Nothing outside
+# of the copy refers to anything in it, so every copy starts out unshared and
+# owned by the copy holding it. The copy at the top keeps the original's
+# owner until it's adopted
+def copy_owned(value, memo):
+    copied = value.__class__.__new__(value.__class__)
+    memo[id(value)] = copied
+    holders = memo.setdefault("holders", [])
+    holders.append(copied)
+    for name in _slot_names(value.__class__):
+        attribute = getattr(value, name)
+        if name == "owner":
+            attribute = holders[-2] if len(holders) > 1 else attribute
+        elif name == "shared":
+            attribute = False
+        else:
+            attribute = deepcopy(attribute, memo)
+        setattr(copied, name, attribute)
+    holders.pop()
+    return copied
+
+
+_slot_names_by_class = {}
+
+
+# The names of the slots instances of cls have, from every class it inherits
+def _slot_names(cls):
+    names = _slot_names_by_class.get(cls)
+    if names is None:
+        names = []
+        for base in cls.__mro__:
+            names.extend(base.__dict__.get("__slots__", ()))
+        _slot_names_by_class[cls] = names
+    return names
@@ -0,0 +1,121 @@
+"""
+Parses every .br program under the v* folders with both the PLY parser
+(brewparse) and the hand-written one (brewpratt), and checks that they build
+identical Element trees and reject the same programs with the same messages.
+Also parses them from several threads at once, with a brewparse.Parser each.
+"""
+
+import glob
+import sys
+import threading
+from contextlib import redirect_stdout
+from io import StringIO
+
+import brewparse
+import brewpratt
+from element import Element
+
+# Precedence, lexing and syntax error cases the test programs don't cover
+EXTRA_PROGRAMS = [
+    "func main() { x = -a * b + !c == d && e || f; }",
+    "func main() { x = 1 < 2 < 3; y = a - -b / c * (d - e); z = !-!1; }",
+    'func main() { a.b = o.f(1, "s", lambda(ref x, y) { return; }); o.m(); }',
+    "func main() { if (x) { y; } else { z; } while (!x) { @; nil; true; } }",
+    "func main() { /* multi\nline */ x = a + b \n * c; }",
+    "func main() { x = 1 & 2; }",
+    'func main() { print("a); }',
+    "func main() { x = 1 +; }",
+    "func main() {}",
+    "",
+    "func main() { a.b.c = 1; }",
+    "func main() { f(1,); }",
+    "func main() { if (x) { y; } else z; }",
+    "func main() { return }",
+    "func main() { ref = 1; }",
+    "func main() { x = 1;\r\n }",
+    "func main() { x = 1; } /* unterminated",
+]
+
+
+def same_tree(first, second):
+    if type(first) != type(second):
+        return False
+    if isinstance(first, Element):
+        return (
+            first.elem_type == second.elem_type
+            and list(first.dict.keys()) == list(second.dict.keys())
+            and all(same_tree(first.dict[key], second.dict[key]) for key in first.dict)
+        )
+    if isinstance(first, list):
+        return len(first) == len(second) and all(
+            same_tree(a, b) for a, b in zip(first, second)
+        )
+    return first == second
+
+
+def parse(parse_program, program):
+    """Returns the tree, or None along with what was printed on a syntax error"""
+    messages = StringIO()
+    with redirect_stdout(messages):
+        try:
+            return parse_program(program), messages.getvalue()
+        except SyntaxError:
+            return None, messages.getvalue()
+
+
+def parse_in_threads(trees, num_threads=8):
+    """Returns the names of programs whose tree changed when parsed from
+    num_threads threads at once"""
+    mismatches = []
+
+    def parse_all():
+        parser = brewparse.Parser()
+        for srcfile, (program, expected) in trees.items():
+            if not same_tree(expected, parser.parse_program(program)):
+                mismatches.append(srcfile)
+
+    threads = [threading.Thread(target=parse_all) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(set(mismatches))
+
+
+def main():
+    programs = []
+    for srcfile in sorted(glob.glob("v*/**/*.br", recursive=True)):
+        with open(srcfile, encoding="utf-8") as handle:
+            # The same way tester.py reads programs
+            programs.append((srcfile, "\n".join(handle.readlines())))
+    for program in EXTRA_PROGRAMS:
+        programs.append((repr(program), program))
+    mismatches = []
+    trees = {}
+    for srcfile, program in programs:
+        expected, expected_messages = parse(brewparse.parse_program, program)
+        received, received_messages = parse(brewpratt.parse_program, program)
+        if expected is None or received is None:
+            if expected is not received or expected_messages != received_messages:
+                mismatches.append(srcfile)
+        elif not same_tree(expected, received):
+            mismatches.append(srcfile)
+        elif not expected_messages:
+            trees[srcfile] = (program, expected)
+    for srcfile in mismatches:
+        print(f"Parse trees differ for {srcfile}")
+    print(
+        f"{len(programs) - len(mismatches)}/{len(programs)} programs parsed the same."
+    )
+    # Programs with (lexing) errors print, so they're only parsed sequentially
+    thread_mismatches = parse_in_threads(trees)
+    for srcfile in thread_mismatches:
+        print(f"Parse tree differs when parsed in parallel for {srcfile}")
+    print(
+        f"{len(trees) - len(thread_mismatches)}/{len(trees)} programs parsed the same in parallel."
+    )
+    return 1 if mismatches or thread_mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
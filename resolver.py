@@ -0,0 +1,140 @@
+from intbase import InterpreterBase
+from constants import *
+from element import Element
+
+
+# The address of every access to one of the function's arguments in its
+# body, by the variable or assignment Element making it. An address is
+# (depth, slot) - the number of block scopes between the access and the
+# function's scope, and the argument's index. With dynamic scoping an
+# assignment can modify a variable of any caller, so arguments are the only
+# names provably bound in the function's own scope. Nested lambdas are
+# resolved separately when they're loaded. The Elements are only read, a
+# parse tree can be shared by any number of runs
+def resolve_function(element):
+    if type(element) != Element:
+        raise Exception(f"Expected Element, got {type(element)}")
+    slots = {}
+    for index, arg in enumerate(element.get(ARGS)):
+        slots[arg.get(NAME)] = index
+    addresses = {}
+    _resolve_statements(element.get(STATEMENTS), slots, 0, addresses)
+    return addresses
+
+
+def _resolve_statements(statements, slots, depth, addresses):
+    if statements is None:
+        return
+    for statement in statements:
+        _resolve_statement(statement, slots, depth, addresses)
+
+
+def _resolve_statement(statement, slots, depth, addresses):
+    elem_type = statement.elem_type
+    if elem_type == ASSIGNMENT:
+        _resolve_expression(statement.get(EXPRESSION), slots, depth, addresses)
+        _record(statement, slots, depth, addresses)
+    elif elem_type in CONDITIONALS:
+        # The condition and the statements are evaluated in a new block scope
+        _resolve_expression(statement.get(CONDITION), slots, depth + 1, addresses)
+        _resolve_statements(statement.get(STATEMENTS), slots, depth + 1, addresses)
+        _resolve_statements(statement.get(ELSE_STATEMENTS), slots, depth + 1, addresses)
+    elif elem_type == InterpreterBase.RETURN_DEF:
+        if statement.get(EXPRESSION) is not None:
+            _resolve_expression(statement.get(EXPRESSION), slots, depth, addresses)
+    else:
+        _resolve_expression(statement, slots, depth, addresses)
+
+
+def _resolve_expression(expression, slots, depth, addresses):
+    elem_type = expression.elem_type
+    if elem_type == InterpreterBase.VAR_DEF:
+        _record(expression, slots, depth, addresses)
+    elif elem_type in BINARY_OPERATORS:
+        _resolve_expression(expression.get(OPERAND_1), slots, depth, addresses)
+        _resolve_expression(expression.get(OPERAND_2), slots, depth, addresses)
+    elif elem_type in UNARY_OPERATORS:
+        _resolve_expression(expression.get(OPERAND_1), slots, depth, addresses)
+    elif (
+        elem_type == InterpreterBase.FCALL_DEF or elem_type == InterpreterBase.MCALL_DEF
+    ):
+        for arg in expression.get(ARGS):
+            _resolve_expression(arg, slots, depth, addresses)
+
+
+# For x.y the address is the one of the object x
+def _record(element, slots, depth, addresses):
+    name = element.get(NAME).split(".")[0]
+    if name in slots:
+        addresses[element] = (depth, slots[name])
+
+
+# The names the body of a function or lambda element looks up outside of its
+# own arguments (every variable read or assigned, function called and object
+# whose method is called, including those of nested lambdas), and the
+# (name, number of arguments) of each function it calls - None if it calls
+# methods, whose bodies can't be known before they run
+def find_free_names(element):
+    if type(element) != Element:
+        raise Exception(f"Expected Element, got {type(element)}")
+    names = set()
+    calls = _find_in_statements(element.get(STATEMENTS), names, set())
+    for arg in element.get(ARGS):
+        names.discard(arg.get(NAME))
+    return names, calls
+
+
+def _find_in_statements(statements, names, calls):
+    if statements is None:
+        return calls
+    for statement in statements:
+        calls = _find_in_statement(statement, names, calls)
+    return calls
+
+
+def _find_in_statement(statement, names, calls):
+    elem_type = statement.elem_type
+    if elem_type == ASSIGNMENT:
+        names.add(statement.get(NAME).split(".")[0])
+        return _find_in_expression(statement.get(EXPRESSION), names, calls)
+    if elem_type in CONDITIONALS:
+        calls = _find_in_expression(statement.get(CONDITION), names, calls)
+        calls = _find_in_statements(statement.get(STATEMENTS), names, calls)
+        return _find_in_statements(statement.get(ELSE_STATEMENTS), names, calls)
+    if elem_type == InterpreterBase.RETURN_DEF:
+        if statement.get(EXPRESSION) is None:
+            return calls
+        return _find_in_expression(statement.get(EXPRESSION), names, calls)
+    return _find_in_expression(statement, names, calls)
+
+
+def _find_in_expression(expression, names, calls):
+    elem_type = expression.elem_type
+    if elem_type == InterpreterBase.VAR_DEF:
+        names.add(expression.get(NAME).split(".")[0])
+    elif elem_type in BINARY_OPERATORS:
+        calls = _find_in_expression(expression.get(OPERAND_1), names, calls)
+        calls = _find_in_expression(expression.get(OPERAND_2), names, calls)
+    elif elem_type in UNARY_OPERATORS:
+        calls = _find_in_expression(expression.get(OPERAND_1), names, calls)
+    elif elem_type == InterpreterBase.FCALL_DEF:
+        name = expression.get(NAME)
+        if name not in PRELOADED_FUNCS:
+            names.add(name)
+            if calls is not None:
+                calls.add((name, len(expression.get(ARGS))))
+        for arg in expression.get(ARGS):
+            calls = _find_in_expression(arg, names, calls)
+    elif elem_type == InterpreterBase.MCALL_DEF:
+        names.add(expression.get(OBJREF))
+        calls = None
+        for arg in expression.get(ARGS):
+            _find_in_expression(arg, names, calls)
+    elif elem_type == InterpreterBase.LAMBDA_DEF:
+        lambda_names, lambda_calls = find_free_names(expression)
+        names.update(lambda_names)
+        if lambda_calls is None:
+            calls = None
+        elif calls is not None:
+            calls.update(lambda_calls)
+    return calls
@@ -1,35 +1,71 @@
-from value import Value
+from value import Value, NIL
 from copy import deepcopy
 from element import Element
 from intbase import InterpreterBase
 from constants import *
 import convert_element
+import ownership
 
 
 class Return:
-    def __init__(self, scope, element, trace_output=False):
-        self.scope = scope
-        self.trace_output = trace_output
-        self.__load_element(element)
-
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    __slots__ = ("value", "is_tail_call")
+
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element or element.elem_type != InterpreterBase.RETURN_DEF:
             raise Exception(f"Expected Element, got {type(element)}")
         to_return = element.get(EXPRESSION)
         if to_return is None:
-            self.value = Value(None)
+            self.value = NIL
         else:
             self.value = convert_element.convert_element(
-                element.get(EXPRESSION), self.scope
+                element.get(EXPRESSION), addresses
             )
+        # Returning what a function call returns can end the function before
+        # the call is made
+        self.is_tail_call = (
+            to_return is not None
+            and to_return.elem_type == InterpreterBase.FCALL_DEF
+            and to_return.get(NAME) not in PRELOADED_FUNCS
+        )
 
-    def get_val(self):
-        return self.value.evaluate().copy()
-
-    def evaluate(self):
-        return self
+    def evaluate(self, scope):
+        # The expression is evaluated right away, the node itself is shared
+        # between every invocation of the function
+        if self.is_tail_call:
+            return ReturnValue(self.value.evaluate_tail(scope))
+        return ReturnValue(self.value.evaluate(scope))
 
     def __str__(self):
         return f"Return({str(self.value)})"
+
+
+class ReturnValue:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    # What the function running in frame gives back to the one it was called
+    # from, copied unless nothing else can refer to it
+    def get_val(self, frame, caller_frame):
+        return ownership.give_back(self.value, frame, caller_frame)
+
+    def __str__(self):
+        return f"ReturnValue({str(self.value)})"
+
+
+class TailCall:
+    """A call of func the returning function leaves for its caller to make,
+    with the arguments already evaluated. Returned in place of a value"""
+
+    __slots__ = ("func", "arg_values")
+
+    def __init__(self, func, arg_values):
+        self.func = func
+        self.arg_values = arg_values
+
+    def __str__(self):
+        return f"TailCall({str(self.func)})"
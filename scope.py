@@ -1,31 +1,71 @@
 from constants import *
 from intbase import ErrorType
 from intbase import InterpreterBase
-from copy import deepcopy
 from value import Value
 from lambda_def import LambdaDef
 from function_def import FunctionDef
 from value_wrapper import ValueWrapper
 from object_def import ObjectDef
+from binding_table import BindingTable
+import ownership
 
 
 class Scope:
-    interpreter = None
+    # interpreter is who output, input and errors go to, by default the same
+    # one as the parent scope's. owner is what values stored in this scope's
+    # variables belong to (see ownership) - the frame of the function running
+    # in it by default, or the object or closure this scope holds the fields
+    # or captured variables of
+    __slots__ = (
+        "parent_scope",
+        "interpreter",
+        "owner",
+        "bindings",
+        "__var_map",
+        "__functions",
+        "slots",
+    )
 
-    def __init__(self, parent_scope, interpreter=None, trace_output=False):
+    def __init__(self, parent_scope, interpreter=None, owner=None):
         self.parent_scope = parent_scope
-        if interpreter:
-            Scope.interpreter = interpreter
+        if interpreter is None and parent_scope is not None:
+            interpreter = parent_scope.interpreter
+        self.interpreter = interpreter
+        if owner is None:
+            owner = ownership.Frame() if parent_scope is None else parent_scope.owner
+        self.owner = owner
+        # Only scopes entered on top of the innermost active scope share the
+        # binding table, everything else (objects, captures) walks its parents
+        self.bindings = None
         self.__var_map = {}
         self.__functions = {}
-        self.trace_output = trace_output
+        # ValueWrappers of a function's arguments, in order
+        self.slots = None
+
+    # Makes this the global scope of a program, the scopes it runs in will
+    # share a binding table
+    def track_bindings(self):
+        self.bindings = BindingTable(self)
 
     def get_var_scope(self, var_name):
-        if var_name in self.__var_map:
-            return self
-        if self.parent_scope is None:
-            return None
-        return self.parent_scope.get_var_scope(var_name)
+        scope = self
+        while scope is not None:
+            if scope.bindings is not None and scope.bindings.scopes[-1] is scope:
+                return scope.bindings.lookup(var_name)
+            if var_name in scope.__var_map:
+                return scope
+            scope = scope.parent_scope
+        return None
+
+    # Whether the function running in this scope has any of names bound, in
+    # the scope it runs in or those of the blocks it's in
+    def frame_binds_any(self, names):
+        scope = self
+        while scope is not None and scope.owner is self.owner:
+            if not names.isdisjoint(scope.__var_map):
+                return True
+            scope = scope.parent_scope
+        return False
 
     def is_var(self, var_name):
         return self.get_var_scope(var_name) is not None
@@ -42,51 +82,107 @@ class Scope:
         return scope.__var_map[var_name]
 
     def get_var(self, var_name):
-        return self.get_var_ref(var_name).get_val()
+        # The innermost active scope reads a bound name straight off the
+        # binding table, everything else takes the general path
+        bindings = self.bindings
+        if bindings is not None and bindings.scopes[-1] is self:
+            stack = bindings.bindings.get(var_name)
+            if stack:
+                return stack[-1][1].__var_map[var_name].value
+        return self.get_var_ref(var_name).value
 
     def add_new_var(self, var_name, value):
-        self.__var_map[var_name] = ValueWrapper(value)
+        self.__bind_var(var_name, ValueWrapper(value, self.owner))
 
     def add_ref_var(self, var_name, value):
         # If this isn't a value wrapper, it isn't a ref
         if type(value) != ValueWrapper:
             raise Exception(f"Expected ValueWrapper, got {type(value)}")
-        self.__var_map[var_name] = value
+        self.__bind_var(var_name, value)
+
+    def __bind_var(self, var_name, value_ref):
+        if self.bindings is not None and var_name not in self.__var_map:
+            self.bindings.bind(self, var_name)
+        self.__var_map[var_name] = value_ref
+
+    # Binds each name to its ValueWrapper, also keeping the wrappers as slots
+    # for accesses that were resolved to a (depth, slot) address
+    def add_slot_vars(self, var_names, value_refs):
+        for i in range(len(var_names)):
+            self.add_ref_var(var_names[i], value_refs[i])
+        self.slots = value_refs
+
+    def get_slot_ref(self, depth, slot):
+        scope = self
+        for _ in range(depth):
+            scope = scope.parent_scope
+        return scope.slots[slot]
+
+    def set_slot_var(self, depth, slot, value):
+        self.__check_savable(value)
+        value_ref = self.get_slot_ref(depth, slot)
+        value_ref.set_value(value)
+        ownership.store(value, value_ref.owner, self.owner)
 
     def set_var(self, var_name, value):
-        if (
-            type(value) != Value
-            and type(value) != LambdaDef
-            and type(value) != FunctionDef
-            and type(value) != ObjectDef
-        ):
-            raise Exception(f"Expected savable Value, got {type(value)}")
-        if self.trace_output:
+        if type(value) is not Value:
+            self.__check_savable(value)
+        if self.interpreter.trace_output:
             print(f"Setting {var_name} to {value}")
-        scope = self.get_var_scope(var_name)
+        # Same as get_var_scope, with the binding table looked at in place
+        bindings = self.bindings
+        if bindings is not None and bindings.scopes[-1] is self:
+            stack = bindings.bindings.get(var_name)
+            scope = stack[-1][1] if stack else None
+        else:
+            scope = self.get_var_scope(var_name)
         if scope is None:
             self.add_new_var(var_name, value)
+            value_ref = self.__var_map[var_name]
         else:
-            scope.__var_map[var_name].set_value(value)
+            value_ref = scope.__var_map[var_name]
+            value_ref.value = value
+        # Values are never owned, see ownership.is_owned
+        if type(value) is not Value:
+            ownership.store(value, value_ref.owner, self.owner)
+
+    def __check_savable(self, value):
+        if not isinstance(value, (Value, FunctionDef, ObjectDef)):
+            raise Exception(f"Expected savable Value, got {type(value)}")
 
     def get_func_scope(self, func_name, num_args):
-        if func_name in self.__functions:
-            if num_args == -1:
-                if len(self.__functions[func_name]) == 1:
-                    return self
-                else:
-                    return None
-            if num_args in self.__functions[func_name]:
-                return self
-            if self.trace_output:
-                print(f"Function {func_name} exists but with different number of args")
-        if self.parent_scope is None:
-            return None
-        return self.parent_scope.get_func_scope(func_name, num_args)
-
-    def get_func_ref(self, func_name, num_args):
-        scope = self.get_func_scope(func_name, num_args)
-        if scope is None:
+        scope = self
+        while scope is not None:
+            functions = scope.__functions.get(func_name)
+            if functions is not None:
+                if num_args == -1:
+                    if len(functions) == 1:
+                        return scope
+                    else:
+                        return None
+                if num_args in functions:
+                    return scope
+                if self.interpreter.trace_output:
+                    print(
+                        f"Function {func_name} exists but with different number of args"
+                    )
+            scope = scope.parent_scope
+        return None
+
+    # cache is the CallCache of the call site, if it has one. Functions are only
+    # defined in the global scope, so every scope finds the same ones
+    def get_func_ref(self, func_name, num_args, cache=None):
+        if cache is not None and cache.epoch == self.interpreter.func_epoch:
+            func_ref = cache.func_ref
+        else:
+            scope = self.get_func_scope(func_name, num_args)
+            func_ref = None
+            if scope is not None:
+                func_ref = scope.__functions[func_name][num_args]
+            if cache is not None:
+                cache.epoch = self.interpreter.func_epoch
+                cache.func_ref = func_ref
+        if func_ref is None:
             # Check for functions stored in variables
             var_scope = self.get_var_scope(func_name)
             if var_scope is None:
@@ -102,19 +198,20 @@ class Scope:
                     f"{func_name} is defined but not as a function",
                 )
                 return
-            return func_ref
-        return scope.__functions[func_name][num_args]
+        return func_ref
 
-    def get_func(self, func_name, num_args):
-        return self.get_func_ref(func_name, num_args).get_val()
+    def get_func(self, func_name, num_args, cache=None):
+        return self.get_func_ref(func_name, num_args, cache).get_val()
 
     def add_new_func(self, func, func_name):
+        self.interpreter.func_epoch += 1
         num_args = len(func.get_args())
         if func_name not in self.__functions:
             self.__functions[func_name] = {}
         self.__functions[func_name][num_args] = ValueWrapper(func)
 
     def add_ref_func(self, func, func_name):
+        self.interpreter.func_epoch += 1
         num_args = len(func.get_val().get_args())
         # If this isn't a value wrapper, it isn't a ref
         if type(func) != ValueWrapper:
@@ -124,9 +221,10 @@ class Scope:
         self.__functions[func_name][num_args] = func
 
     def set_func(self, func, func_name):
+        self.interpreter.func_epoch += 1
         if type(func) != FunctionDef:
             self.error(ErrorType.TYPE_ERROR, f"Expected FunctionDef, got {type(func)}")
-        if self.trace_output:
+        if self.interpreter.trace_output:
             print(f"Setting {func_name} to {str(func)}")
         num_args = len(func.get_args())
         scope = self.get_func_scope(func_name, num_args)
@@ -135,18 +233,20 @@ class Scope:
         else:
             scope.__functions[func_name][num_args].set_value(func)
 
-    def copy(self):
-        if self.trace_output:
-            print("Copying scope")
-            print(f"Vars: {self.__var_map}")
-            print(f"Functions: {self.__functions}")
-        if self.parent_scope is None:
-            new_scope = Scope(None)
-        else:
-            parent_copy = self.parent_scope.copy()
-            new_scope = Scope(parent_copy)
-        for var in self.__var_map.keys():
-            val_ref = self.__var_map[var]
+    # The scope a closure (owner) made here captures - the variables visible
+    # from this scope named in names, or all of them if names is None. Objects
+    # and functions are shared with this scope and everything else is copied
+    def capture(self, names, owner):
+        if self.interpreter.trace_output:
+            print(f"Capturing {names} from scope")
+        captured = Scope(None, self.interpreter, owner)
+        if names is None:
+            names = self.__get_visible_names()
+        for var in names:
+            scope = self.get_var_scope(var)
+            if scope is None:
+                continue
+            val_ref = scope.__var_map[var]
             val = val_ref.get_val()
             val_type = val.get_type()
             if (
@@ -154,78 +254,90 @@ class Scope:
                 or val_type == InterpreterBase.FUNC_DEF
                 or val_type == InterpreterBase.LAMBDA_DEF
             ):
-                new_scope.add_ref_var(var, val_ref)
+                captured.add_ref_var(var, val_ref)
+                ownership.capture(val_ref, owner)
             else:
-                new_scope.add_new_var(var, deepcopy(val))
-        for func in self.__functions.keys():
-            for num_args in self.__functions[func]:
-                new_scope.add_new_func(
-                    self.__functions[func][num_args].get_val(), deepcopy(func)
-                )
-        new_scope.trace_output = self.trace_output
-        return new_scope
-
-    def shallow_copy(self):
-        if self.trace_output:
-            print("Shallow copying scope")
-            print(f"Vars: {self.__var_map}")
-            print(f"Functions: {self.__functions}")
-        if self.parent_scope is None:
-            new_scope = Scope(None)
-        else:
-            parent_copy = self.parent_scope.shallow_copy()
-            new_scope = Scope(parent_copy)
-        for var in self.__var_map.keys():
-            new_scope.add_ref_var(var, self.get_var_ref(var))
-        for func_name in self.__functions.keys():
-            for num_args in self.__functions[func_name]:
-                new_scope.add_ref_func(
-                    self.get_func_ref(func_name, num_args), func_name
-                )
-        new_scope.trace_output = self.trace_output
-        return new_scope
+                captured.add_new_var(var, val.copy())
+        return captured
+
+    def __get_visible_names(self):
+        names = set()
+        scope = self
+        while scope is not None:
+            names.update(scope.__var_map)
+            scope = scope.parent_scope
+        return names
 
     def __dump_info(self):
         print(str(self))
 
-    def get_base_scope(self):
-        if self.parent_scope is None:
-            return self
-        return self.parent_scope.get_base_scope()
+    # The scope one call of a closure runs below - variables are looked up in
+    # the closure's captured scope first, then from this scope. The captured
+    # variables are shared rather than copied and the captured scope is left
+    # alone, so calls of the same closure can nest or run at the same time.
+    # Entered on the binding table like a child scope, binding every captured
+    # name, and left the same way with exit_scope
+    def make_closure_scope(self, captured_scope):
+        closure_scope = Scope(self)
+        closure_scope.__var_map = captured_scope.__var_map
+        if self.bindings is not None and self.bindings.scopes[-1] is self:
+            closure_scope.bindings = self.bindings
+            self.bindings.enter(closure_scope)
+            for var_name in closure_scope.__var_map:
+                self.bindings.bind(closure_scope, var_name)
+        return closure_scope
+
+    # owner is a new Frame for the scope a function runs in, block scopes
+    # belong to the same frame as their parent
+    def make_child_scope(self, owner=None):
+        child = Scope(self, owner=owner)
+        if self.bindings is not None and self.bindings.scopes[-1] is self:
+            child.bindings = self.bindings
+            self.bindings.enter(child)
+        return child
 
-    # Finds the base scope and adds the passed scope as the new base scope
-    def add_base_scope(self, base_scope):
-        self.get_base_scope().parent_scope = base_scope
+    # Must be called once a scope made by make_child_scope or
+    # make_closure_scope is done with
+    def exit_scope(self):
+        if self.bindings is not None:
+            self.bindings.leave(self)
 
-    def make_child_scope(self):
-        return Scope(self)
+    # Leaves every scope entered on top of this one that wasn't left yet, for
+    # code continuing in this scope once a call returns
+    def exit_scopes_above(self):
+        if self.bindings is not None:
+            self.bindings.leave_above(self)
 
     def error(self, error_type, message):
-        if self.trace_output:
+        if self.interpreter.trace_output:
             self.__dump_info()
-        Scope.interpreter.error(error_type, message)
+        self.interpreter.error(error_type, message)
 
     def output(self, args):
         final_str = ""
         for arg in args:
-            eval_arg = arg.evaluate()
-            if eval_arg.get_type() == InterpreterBase.NIL_DEF:
-                final_str += "nil"
-            elif eval_arg.get_type() == InterpreterBase.STRING_DEF:
-                final_str += eval_arg.get_val()
-            elif eval_arg.get_type() == InterpreterBase.INT_DEF:
-                final_str += str(eval_arg.get_val())
-            elif eval_arg.get_type() == InterpreterBase.BOOL_DEF:
-                final_str += "true" if eval_arg.get_val() else "false"
-            else:
-                self.error(
-                    ErrorType.TYPE_ERROR,
-                    f"Expected Value, got {eval_arg.get_type()}",
-                )
-        Scope.interpreter.output(final_str)
+            final_str += self.format_value(arg.evaluate(self))
+        self.output_string(final_str)
+
+    def format_value(self, value):
+        if value.get_type() == InterpreterBase.NIL_DEF:
+            return "nil"
+        elif value.get_type() == InterpreterBase.STRING_DEF:
+            return value.get_val()
+        elif value.get_type() == InterpreterBase.INT_DEF:
+            return str(value.get_val())
+        elif value.get_type() == InterpreterBase.BOOL_DEF:
+            return "true" if value.get_val() else "false"
+        self.error(
+            ErrorType.TYPE_ERROR,
+            f"Expected Value, got {value.get_type()}",
+        )
+
+    def output_string(self, final_str):
+        self.interpreter.output(final_str)
 
     def get_input(self):
-        return Scope.interpreter.get_input()
+        return self.interpreter.get_input()
 
     def __str__(self):
         final_str = ""
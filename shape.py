@@ -0,0 +1,60 @@
+import threading
+
+
+class Shape:
+    """The layout of an object's fields, shared between objects.
+
+    Objects that had the same fields added in the same order have the same
+    shape, which maps each field name to the object's slot holding it. Adding
+    a field moves an object to the next shape along a transition, so a shape
+    is never modified once objects use it.
+
+    Shapes along a chain of transitions share one name to slot table - a
+    shape only uses the entries below its size. The table is only copied when
+    a second transition branches off a shape that isn't the end of its chain.
+    """
+
+    __slots__ = ("slots", "size", "transitions")
+
+    def __init__(self, slots, size):
+        self.slots = slots
+        self.size = size
+        self.transitions = {}
+
+    # The slot of field_name, or None if objects of this shape don't have it
+    def get_slot(self, field_name):
+        slot = self.slots.get(field_name)
+        if slot is None or slot >= self.size:
+            return None
+        return slot
+
+    # The shape of an object of this shape once field_name is added to it
+    def add_field(self, field_name):
+        shape = self.transitions.get(field_name)
+        if shape is None:
+            with _transition_lock:
+                shape = self.transitions.get(field_name)
+                if shape is None:
+                    shape = self.__make_transition(field_name)
+        return shape
+
+    def __make_transition(self, field_name):
+        slots = self.slots
+        if len(slots) != self.size:
+            slots = {name: slot for name, slot in slots.items() if slot < self.size}
+        slots[field_name] = self.size
+        shape = Shape(slots, self.size + 1)
+        self.transitions[field_name] = shape
+        return shape
+
+    # Shapes are shared, copies of objects keep the same one
+    def __deepcopy__(self, memo):
+        return self
+
+
+# Transitions are shared by every interpreter in the process, only making a
+# new one needs the lock
+_transition_lock = threading.Lock()
+
+# The shape of every object before it has any fields
+EMPTY_SHAPE = Shape({}, 0)
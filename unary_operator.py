@@ -1,5 +1,5 @@
 from element import Element
-from value import Value
+from value import make_value
 from constants import *
 import convert_element
 from intbase import InterpreterBase
@@ -7,47 +7,80 @@ from intbase import ErrorType
 
 
 class UnaryOperator:
-    def __init__(self, scope, element, trace_output=False):
-        self.scope = scope
-        self.trace_output = trace_output
-        self.__load_element(element)
-
-    def __load_element(self, element):
-        if self.trace_output:
-            print(f"Loading element {str(element)}")
+    __slots__ = ("type", "handlers", "value")
+
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element:
             raise Exception(f"Expected Element, got {type(element)}")
         self.type = element.elem_type
         if not self.type in UNARY_OPERATORS:
             raise Exception(f"Unknown element type {self.type}")
-        self.value = convert_element.convert_element(element.get(OPERAND_1), self.scope)
+        # The handlers of the operator, by operand type
+        self.handlers = HANDLERS[self.type]
+        self.value = convert_element.convert_element(element.get(OPERAND_1), addresses)
 
-    def evaluate(self):
-        if self.trace_output:
+    def evaluate(self, scope):
+        if scope.interpreter.trace_output:
             print(f"Evaluating {str(self)}")
-        self.value = self.value.evaluate()
-        if self.type == InterpreterBase.NOT_DEF:
-            return self.__eval_not()
-        elif self.type == InterpreterBase.NEG_DEF:
-            return self.__eval_neg()
-
-    def __eval_not(self):
-        value = self.value
-        if self.value.get_type() == InterpreterBase.INT_DEF:
-            value = self.value.converted_type(InterpreterBase.BOOL_DEF)
-        elif self.value.get_type() != InterpreterBase.BOOL_DEF:
-            self.scope.error(
-                ErrorType.TYPE_ERROR,
-                "Cannot perform boolean operations on non-boolean values",
-            )
-        if value:
-            return Value(not value.get_val())
-
-    def __eval_neg(self):
-        val_type = self.value.get_type()
-        if val_type == InterpreterBase.INT_DEF:
-            return Value(-self.value.get_val())
-        self.scope.error(ErrorType.TYPE_ERROR, "Cannot negate non-integers")
+        value = self.value.evaluate(scope)
+        handler = self.handlers.get(value.get_type())
+        if handler is not None:
+            return handler(value)
+        return _eval_general(self.type, scope, value)
 
     def __str__(self):
         return f"UnaryOperator({self.type}, {str(self.value)})"
+
+
+# Applies a unary operator to an already evaluated operand
+def operate(op, scope, value):
+    handler = HANDLERS[op].get(value.get_type())
+    if handler is not None:
+        return handler(value)
+    return _eval_general(op, scope, value)
+
+
+# Any operator on any operand, converting it and reporting type errors
+def _eval_general(op, scope, value):
+    if op == InterpreterBase.NOT_DEF:
+        return _eval_not(scope, value)
+    elif op == InterpreterBase.NEG_DEF:
+        return _eval_neg(scope, value)
+
+
+def _eval_not(scope, value):
+    if value.get_type() == InterpreterBase.INT_DEF:
+        value = value.converted_type(InterpreterBase.BOOL_DEF)
+    elif value.get_type() != InterpreterBase.BOOL_DEF:
+        scope.error(
+            ErrorType.TYPE_ERROR,
+            "Cannot perform boolean operations on non-boolean values",
+        )
+    if value:
+        return make_value(not value.get_val())
+
+
+def _eval_neg(scope, value):
+    val_type = value.get_type()
+    if val_type == InterpreterBase.INT_DEF:
+        return make_value(-value.get_val())
+    scope.error(ErrorType.TYPE_ERROR, "Cannot negate non-integers")
+
+
+def _negate_int(value):
+    return make_value(-value.get_val())
+
+
+def _not_bool(value):
+    return make_value(not value.get_val())
+
+
+# Every unary operator's handlers, by the type of operand they take without
+# converting it. Everything else goes through _eval_general
+HANDLERS = {
+    InterpreterBase.NEG_DEF: {InterpreterBase.INT_DEF: _negate_int},
+    InterpreterBase.NOT_DEF: {InterpreterBase.BOOL_DEF: _not_bool},
+}
@@ -1,49 +1,63 @@
 from element import Element
 from intbase import InterpreterBase
 from constants import *
-from copy import deepcopy
 
 
+# Values are immutable - operations always make a new Value - so the same
+# Value can be shared by any number of variables, arguments and objects
 class Value:
-    def __init__(self, element, trace_output=False):
-        self.trace_output = trace_output
+    __slots__ = ("value", "type")
+
+    def __init__(self, element):
         self.__load_element(element)
 
     def __load_element(self, element):
         # Checking if we have been passed a raw value or an element object
         if type(element) == Element:
-            if self.trace_output:
-                print(f"Loading element {str(element)}")
-            self.type = element.elem_type
-            if self.type == InterpreterBase.INT_DEF:
-                self.value = int(element.get(VALUE))
-            elif self.type == InterpreterBase.BOOL_DEF:
-                self.value = element.get(VALUE)
-            elif self.type == InterpreterBase.STRING_DEF:
-                self.value = element.get(VALUE)
-            elif self.type == InterpreterBase.NIL_DEF:
-                self.value = None
+            value_type = element.elem_type
+            if value_type == InterpreterBase.INT_DEF:
+                raw_value = int(element.get(VALUE))
+            elif value_type == InterpreterBase.BOOL_DEF:
+                raw_value = element.get(VALUE)
+            elif value_type == InterpreterBase.STRING_DEF:
+                raw_value = element.get(VALUE)
+            elif value_type == InterpreterBase.NIL_DEF:
+                raw_value = None
             else:
-                raise Exception(f"Unknown element type {self.type}")
+                raise Exception(f"Unknown element type {value_type}")
         elif type(element) == Value:
-            if self.trace_output:
-                print(f"Loading value {str(element)}")
-            self.value = element.get_val()
-            self.type = element.get_type()
+            raw_value = element.get_val()
+            value_type = element.get_type()
         else:
-            if self.trace_output:
-                print(f"Loading raw value {element}")
-            self.value = element
+            raw_value = element
             if type(element) == int:
-                self.type = InterpreterBase.INT_DEF
+                value_type = InterpreterBase.INT_DEF
             elif type(element) == bool:
-                self.type = InterpreterBase.BOOL_DEF
+                value_type = InterpreterBase.BOOL_DEF
             elif type(element) == str:
-                self.type = InterpreterBase.STRING_DEF
+                value_type = InterpreterBase.STRING_DEF
             elif element == None:
-                self.type = InterpreterBase.NIL_DEF
+                value_type = InterpreterBase.NIL_DEF
             else:
                 raise Exception(f"Unknown raw value type {type(element)}")
+        _set_value(self, raw_value)
+        _set_type(self, value_type)
+
+    # A Value of raw_value when its type is already known, without checking it.
+    # Bools, nil and small ints are the shared instances of them
+    @staticmethod
+    def of_type(raw_value, value_type):
+        if value_type == InterpreterBase.INT_DEF:
+            if _small_int_min <= raw_value <= _small_int_max:
+                return _small_ints[raw_value - _small_int_min]
+        elif value_type == InterpreterBase.BOOL_DEF:
+            return TRUE if raw_value else FALSE
+        elif value_type == InterpreterBase.NIL_DEF:
+            return NIL
+        value = Value.__new__(Value)
+        _set_value(value, raw_value)
+        _set_type(value, value_type)
+        return value
 
     def get_val(self):
         return self.value
@@ -51,7 +65,7 @@ class Value:
     def get_type(self):
         return self.type
 
-    def evaluate(self):
+    def evaluate(self, scope=None):
         return self
 
     def converted_type(self, type):
@@ -59,14 +73,70 @@ class Value:
             return self
         if type == InterpreterBase.INT_DEF:
             if self.type == InterpreterBase.BOOL_DEF:
-                return Value(1 if self.value else 0)
+                return Value.of_type(1 if self.value else 0, type)
         if type == InterpreterBase.BOOL_DEF:
             if self.type == InterpreterBase.INT_DEF:
-                return Value(self.value != 0)
+                return Value.of_type(self.value != 0, type)
         return None
 
     def copy(self):
-        return deepcopy(self)
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return f"Value({self.value} of type {self.type})"
+
+    # Shared Values must never change, only the constructors set the slots
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Value is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Value is immutable, cannot delete {name}")
+
+
+# Set the slots of a Value being made, bypassing __setattr__
+_set_value = Value.value.__set__
+_set_type = Value.type.__set__
+
+
+# Shared instances of the values operations produce over and over, a Value
+# never changes so one instance can stand for every occurrence of its value
+TRUE = Value(True)
+FALSE = Value(False)
+NIL = Value(None)
+
+_small_int_min = 0
+_small_int_max = -1
+_small_ints = []
+
+
+# Makes the ints from low to high inclusive shared instances
+def cache_small_ints(low, high):
+    global _small_int_min, _small_int_max, _small_ints
+    _small_ints = [Value(number) for number in range(low, high + 1)]
+    _small_int_min = low
+    _small_int_max = high
+
+
+cache_small_ints(-128, 1024)
+
+_RAW_VALUE_TYPES = {
+    int: InterpreterBase.INT_DEF,
+    bool: InterpreterBase.BOOL_DEF,
+    str: InterpreterBase.STRING_DEF,
+    type(None): InterpreterBase.NIL_DEF,
+}
+
+
+# A Value of a raw Python value, the same as Value(raw_value) but without
+# checking for elements and sharing the instances of common values
+def make_value(raw_value):
+    value_type = _RAW_VALUE_TYPES.get(type(raw_value))
+    if value_type is None:
+        raise Exception(f"Unknown raw value type {type(raw_value)}")
+    return Value.of_type(raw_value, value_type)
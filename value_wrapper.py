@@ -1,6 +1,11 @@
 class ValueWrapper:
-    def __init__(self, value):
+    __slots__ = ("value", "owner")
+
+    # owner is what the stored value belongs to (see ownership), which stays
+    # the same when the wrapper is shared as a reference
+    def __init__(self, value, owner=None):
         self.value = value
+        self.owner = owner
 
     def get_val(self):
         return self.value
@@ -8,5 +13,5 @@ class ValueWrapper:
     def set_value(self, value):
         self.value = value
 
-    def evaluate(self):
+    def evaluate(self, scope=None):
         return self
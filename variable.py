@@ -1,35 +1,49 @@
 from constants import *
 from element import Element
 from intbase import InterpreterBase, ErrorType
+from field_cache import FieldCache
 
 
 class Variable:
-    def __init__(self, scope, element, trace_output=False):
-        self.trace_output = trace_output
-        self.scope = scope
-        self.__load_element(element)
+    __slots__ = ("name", "address", "field_cache")
 
-    def __load_element(self, element):
+    def __init__(self, element, addresses=None):
+        self.__load_element(element, addresses)
+
+    def __load_element(self, element, addresses):
         if type(element) != Element or element.elem_type != InterpreterBase.VAR_DEF:
             raise Exception(f"Expected Variable Element, got {type(element)}")
         self.name = element.get(NAME)
+        # Found by resolve_function if this is one of the function's arguments
+        self.address = None if addresses is None else addresses.get(element)
+        self.field_cache = FieldCache() if "." in self.name else None
 
     def get_name(self):
         return self.name
 
-    def get_ref(self):
-        return self.scope.get_var_ref(self.name)
+    def get_ref(self, scope):
+        if self.address is not None:
+            return scope.get_slot_ref(*self.address)
+        return scope.get_var_ref(self.name)
 
     def get_type(self):
         return InterpreterBase.VAR_DEF
 
-    def evaluate(self):
-        if self.trace_output:
+    def evaluate(self, scope):
+        if scope.interpreter.trace_output:
             print(f"Evaluating {str(self)}")
-        if "." in self.name:
+        if self.field_cache is not None:
             name, field = self.name.split(".")
-            var = self.scope.get_var(name)
+            var = self.__get_var(scope, name)
             if var.get_type() != InterpreterBase.OBJ_DEF:
-                self.scope.error(ErrorType.TYPE_ERROR, f"{name} is not an object")
-            return self.scope.get_var(name).get_field(field)
-        return self.scope.get_var(self.name)
+                scope.error(ErrorType.TYPE_ERROR, f"{name} is not an object")
+            return var.get_field(field, self.field_cache)
+        return self.__get_var(scope, self.name)
+
+    def __get_var(self, scope, name):
+        if self.address is not None:
+            return scope.get_slot_ref(*self.address).get_val()
+        return scope.get_var(name)
+
+    def __str__(self):
+        return f"Variable({self.name})"